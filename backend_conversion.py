@@ -1,38 +1,98 @@
 # Save this file as backend_conversion.py
 
 import fitz
+from array import array
 from pptx import Presentation
 from pptx.util import Pt, Inches
 import io
+import math
 import traceback
+from page_selection import parse_page_ranges
 
 POINTS_TO_EMUS = 12700
+# Upper bound on the pixels rendered for one page, whatever its size
+MAX_PAGE_MEGAPIXELS = 16
+# get_text("dict") flags without TEXT_PRESERVE_IMAGES: image blocks would
+# otherwise carry a copy of every image's bytes.
+TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+
+def _page_dpi(page, slide_width, slide_height, dpi, max_megapixels):
+    """
+    Picks the render resolution for one page: as many pixels as the slide
+    has at 'dpi', so a poster-sized page is rendered at a lower resolution
+    than a letter-sized one, but never more than 'max_megapixels'.
+    """
+    width, height = page.rect.width, page.rect.height
+    scale = math.sqrt((slide_width / POINTS_TO_EMUS / width) * (slide_height / POINTS_TO_EMUS / height))
+    page_dpi = dpi * scale
+    if max_megapixels:
+        page_dpi = min(page_dpi, math.sqrt(max_megapixels * 1e6 / ((width / 72) * (height / 72))))
+    return page_dpi
+
+
+def _extract_spans(page):
+    """
+    Returns the text spans of a page in a compact form: flat arrays of the
+    span boxes and font sizes, a bold flag per span, and all the text in
+    one string with the offsets that cut it into spans. Image blocks are
+    not extracted, and fonts, colours and origins are not kept.
+    """
+    bboxes, sizes, bold, texts, offsets = array('f'), array('f'), bytearray(), [], array('l', [0])
+    for block in page.get_text("dict", flags=TEXT_FLAGS)["blocks"]:
+        if block['type'] == 0:
+            for line in block['lines']:
+                for span in line['spans']:
+                    bboxes.extend(span['bbox'])
+                    sizes.append(span['size'])
+                    bold.append("bold" in span['font'].lower())
+                    texts.append(span['text'])
+                    offsets.append(offsets[-1] + len(span['text']))
+    return bboxes, sizes, bytes(bold), ''.join(texts), offsets
+
+
+def _iter_spans(spans):
+    """Yields (bbox, text, size, bold) for each span returned by _extract_spans()."""
+    bboxes, sizes, bold, text, offsets = spans
+    for index in range(len(sizes)):
+        yield (tuple(bboxes[4 * index:4 * index + 4]), text[offsets[index]:offsets[index + 1]],
+               sizes[index], bool(bold[index]))
+
 
 # --- MODIFIED: Added 'dpi' parameter ---
-def convert_pdf_to_ppt_hybrid(pdf_path, ppt_path, progress_callback, dpi=150):
+def convert_pdf_to_ppt_hybrid(pdf_path, ppt_path, progress_callback, dpi=150,
+                              max_megapixels=MAX_PAGE_MEGAPIXELS, pages=None):
     """
     Converts PDF to a hybrid PPT using a robust in-memory redaction method.
-    The 'dpi' parameter controls the quality and speed of background rendering.
+    The 'dpi' parameter controls the quality and speed of background rendering;
+    each page is rendered to the slide's pixel size at that DPI, up to
+    'max_megapixels' per page. 'pages' selects the pages to convert, e.g.
+    "1-20, 45, 100-110"; the others are not touched.
     """
     try:
         original_doc = fitz.open(pdf_path)
         if original_doc.page_count == 0:
             return "The selected PDF is empty."
+        # --- MODIFIED: Only the selected pages are extracted and rendered ---
+        try:
+            page_nums = parse_page_ranges(pages, original_doc.page_count)
+        except ValueError as e:
+            original_doc.close()
+            return f"Invalid page selection: {e}"
         
-        original_text_data = [page.get_text("dict") for page in original_doc]
+        # --- MODIFIED: Only the span fields used below are kept, not the whole get_text("dict") ---
+        original_text_data = [_extract_spans(original_doc.load_page(page_num)) for page_num in page_nums]
         
         clean_doc_in_memory = fitz.open()
-        for page_num, page in enumerate(original_doc):
-            for block in original_text_data[page_num]["blocks"]:
-                if block['type'] == 0:
-                    for line in block['lines']:
-                        for span in line['spans']:
-                            redaction_rect = fitz.Rect(span['bbox'])
-                            redaction_rect.x0 -= 2
-                            redaction_rect.y0 -= 2
-                            redaction_rect.x1 += 2
-                            redaction_rect.y1 += 2
-                            page.add_redact_annot(redaction_rect)
+        for index, page_num in enumerate(page_nums):
+            page = original_doc.load_page(page_num)
+            for bbox, _, _, _ in _iter_spans(original_text_data[index]):
+                redaction_rect = fitz.Rect(bbox)
+                redaction_rect.x0 -= 2
+                redaction_rect.y0 -= 2
+                redaction_rect.x1 += 2
+                redaction_rect.y1 += 2
+                page.add_redact_annot(redaction_rect)
             
             page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
             clean_doc_in_memory.insert_pdf(original_doc, from_page=page.number, to_page=page.number)
@@ -45,8 +105,9 @@ def convert_pdf_to_ppt_hybrid(pdf_path, ppt_path, progress_callback, dpi=150):
         prs.slide_height = int(first_page.rect.height * POINTS_TO_EMUS)
 
         for page_num, page in enumerate(clean_doc_in_memory):
-            # --- MODIFIED: Use the 'dpi' parameter here ---
-            pix = page.get_pixmap(dpi=dpi)
+            # --- MODIFIED: Resolution is picked per page from 'dpi' ---
+            zoom = _page_dpi(page, prs.slide_width, prs.slide_height, dpi, max_megapixels) / 72
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
             
             slide = prs.slides.add_slide(prs.slide_layouts[6])
             slide.shapes.add_picture(
@@ -54,28 +115,23 @@ def convert_pdf_to_ppt_hybrid(pdf_path, ppt_path, progress_callback, dpi=150):
                 width=prs.slide_width, height=prs.slide_height
             )
 
-            page_text_data = original_text_data[page_num]
-            for block in page_text_data["blocks"]:
-                if block['type'] == 0:
-                    for line in block['lines']:
-                        for span in line['spans']:
-                            x0, y0, x1, y1 = span['bbox']
-                            txBox = slide.shapes.add_textbox(
-                                int(x0 * POINTS_TO_EMUS), int(y0 * POINTS_TO_EMUS),
-                                int((x1 - x0) * POINTS_TO_EMUS), int((y1 - y0) * POINTS_TO_EMUS)
-                            )
-                            txBox.fill.background()
-                            txBox.line.fill.background()
-                            p = txBox.text_frame.paragraphs[0]
-                            p.margin_left = 0
-                            p.margin_right = 0
-                            p.margin_top = 0
-                            p.margin_bottom = 0
-                            run = p.add_run()
-                            run.text = span['text']
-                            font = run.font
-                            font.size = Pt(int(span['size']))
-                            if "bold" in span['font'].lower(): font.bold = True
+            for (x0, y0, x1, y1), text, size, bold in _iter_spans(original_text_data[page_num]):
+                txBox = slide.shapes.add_textbox(
+                    int(x0 * POINTS_TO_EMUS), int(y0 * POINTS_TO_EMUS),
+                    int((x1 - x0) * POINTS_TO_EMUS), int((y1 - y0) * POINTS_TO_EMUS)
+                )
+                txBox.fill.background()
+                txBox.line.fill.background()
+                p = txBox.text_frame.paragraphs[0]
+                p.margin_left = 0
+                p.margin_right = 0
+                p.margin_top = 0
+                p.margin_bottom = 0
+                run = p.add_run()
+                run.text = text
+                font = run.font
+                font.size = Pt(int(size))
+                if bold: font.bold = True
             
             progress_callback(page_num + 1, len(clean_doc_in_memory))
 
@@ -87,27 +143,37 @@ def convert_pdf_to_ppt_hybrid(pdf_path, ppt_path, progress_callback, dpi=150):
         return f"Hybrid conversion failed: {str(e)}"
 
 # --- MODIFIED: Added 'dpi' parameter ---
-def convert_pdf_to_ppt_image_only(pdf_path, ppt_path, progress_callback, dpi=150):
+def convert_pdf_to_ppt_image_only(pdf_path, ppt_path, progress_callback, dpi=150,
+                                  max_megapixels=MAX_PAGE_MEGAPIXELS, pages=None):
     """
     Converts each PDF page to a non-editable image on a PPT slide.
-    The 'dpi' parameter controls the quality and speed.
+    The 'dpi' parameter controls the quality and speed; 'max_megapixels'
+    caps the size of any one page's image. 'pages' selects the pages to
+    convert, as in convert_pdf_to_ppt_hybrid.
     """
     try:
         pdf_doc = fitz.open(pdf_path)
         prs = Presentation()
-        total_pages = len(pdf_doc)
-        if total_pages == 0: return "The selected PDF is empty."
+        if len(pdf_doc) == 0: return "The selected PDF is empty."
+        try:
+            page_nums = parse_page_ranges(pages, len(pdf_doc))
+        except ValueError as e:
+            pdf_doc.close()
+            return f"Invalid page selection: {e}"
+        total_pages = len(page_nums)
         prs.slide_width = Inches(16)
         prs.slide_height = Inches(9)
-        for page_num, page in enumerate(pdf_doc):
-            # --- MODIFIED: Use the 'dpi' parameter here ---
-            pix = page.get_pixmap(dpi=dpi)
+        for index, page_num in enumerate(page_nums):
+            page = pdf_doc.load_page(page_num)
+            # --- MODIFIED: Resolution is picked per page from 'dpi' ---
+            zoom = _page_dpi(page, prs.slide_width, prs.slide_height, dpi, max_megapixels) / 72
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
             slide = prs.slides.add_slide(prs.slide_layouts[6])
             slide.shapes.add_picture(
                 io.BytesIO(pix.tobytes("png")), Inches(0), Inches(0),
                 width=prs.slide_width, height=prs.slide_height
             )
-            progress_callback(page_num + 1, total_pages)
+            progress_callback(index + 1, total_pages)
         prs.save(ppt_path)
         pdf_doc.close()
         return None
@@ -1,13 +1,20 @@
 # Save this file as app.py
 import sys
+import multiprocessing
 from flask import Flask, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import os
+import io
 import json
+import math
 from datetime import datetime
 import threading
-from backend_conversion import CONVERSION_STRATEGIES
+from backend_conversion import CONVERSION_STRATEGIES, MAX_PAGE_MEGAPIXELS, worker_slots
+from backend_cache import ConversionCache
+from backend_image_encoder import DEFAULT_JPEG_QUALITY, ENCODERS
+from backend_page_selection import parse_page_ranges
+from backend_pipeline_stats import PipelineStats
 # --- NEW SLIDER MODULE IMPORTS ---
 from backend_ai_generator import generate_presentation
 import subprocess
@@ -27,12 +34,34 @@ else:
 # --- CONFIGURATION ---
 UPLOAD_FOLDER = os.path.join(base_path, 'uploads')
 OUTPUT_FOLDER = os.path.join(base_path, 'outputs')
+# Finished conversions, reused when the same file is converted the same way
+CACHE_FOLDER = os.path.join(base_path, 'cache')
+CONVERSION_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+# Single converted pages, so a revised document only converts its changed pages
+PAGE_CACHE_FOLDER = os.path.join(base_path, 'page_cache')
+# Long side, in pixels, of the page previews served while a conversion runs
+PREVIEW_SIZE = 320
+# Previews of a finished conversion are dropped this many seconds after it ends
+PREVIEW_TTL = 600
+# Rendered images wait here when a conversion runs with a memory budget
+SCRATCH_FOLDER = os.path.join(base_path, 'scratch')
 FFMPEG_PATH = os.path.join(base_path, 'bin')
 VOICES_FOLDER = os.path.join(base_path, 'voices')
 # --- NEW: Templates folder for Slider module ---
 TEMPLATES_FOLDER = os.path.join(base_path, 'templates')
 STATS_FILE = os.path.join(os.path.dirname(sys.executable), 'mondrian_stats.json') if getattr(sys, 'frozen', False) else 'mondrian_stats.json'
 
+# Upper bounds on the resolution a request may ask for, so no request can
+# get around the per-page pixel cap the converters apply
+MAX_REQUEST_DPI = 600
+MAX_REQUEST_MEGAPIXELS = MAX_PAGE_MEGAPIXELS * 4
+# Processes used to render PDF pages in parallel during PDF -> PPTX conversion,
+# for all conversions together (MONDRIAN_CONVERSION_WORKERS overrides the CPU count)
+CONVERSION_WORKERS = int(os.environ.get('MONDRIAN_CONVERSION_WORKERS') or os.cpu_count() or 1)
+worker_slots.limit = CONVERSION_WORKERS
+# The 'mode' of a PDF conversion request picks its strategy; the default is hybrid
+PDF_CONVERSION_MODES = {'image_only': 'pdf_to_ppt_image', 'vector': 'pdf_to_ppt_vector'}
+
 ALLOWED_EXTENSIONS = {'pdf', 'ppt', 'pptx', 'doc', 'docx', 'csv', 'mp4', 'mkv', 'mov', 'avi', 'webm', 'mp3'}
 
 # --- CREATE FOLDERS ---
@@ -46,11 +75,39 @@ os.makedirs(TEMPLATES_FOLDER, exist_ok=True)
 active_conversions = {}
 # --- NEW: Dictionary for active AI generations ---
 active_generations = {}
+conversion_cache = ConversionCache(CACHE_FOLDER, CONVERSION_CACHE_MAX_BYTES)
+# conversion_id -> {page number: JPEG preview}, filled while the conversion runs
+# and kept for PREVIEW_TTL seconds after it ends
+conversion_previews = {}
+
 
+def expire_previews():
+    """Drops the previews of conversions that ended more than PREVIEW_TTL seconds ago."""
+    now = datetime.now().timestamp()
+    for conversion_id in list(conversion_previews):
+        finished_at = active_conversions.get(conversion_id, {}).get('finished_at')
+        if finished_at is not None and now - finished_at > PREVIEW_TTL:
+            conversion_previews.pop(conversion_id, None)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def number_field(data, key, convert, default, minimum=None, maximum=None):
+    """
+    Reads a numeric request field with convert (int or float), 'default'
+    if it is missing. Raises ValueError for values that are not a finite
+    number or fall outside minimum..maximum.
+    """
+    value = data.get(key, default)
+    try:
+        number = convert(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"'{key}' must be a number, got {value!r}")
+    if not math.isfinite(number) or (minimum is not None and number < minimum) \
+            or (maximum is not None and number > maximum):
+        raise ValueError(f"'{key}' is out of range: {value!r}")
+    return number
+
 def load_stats():
     if not os.path.exists(STATS_FILE): return {'usage_count': 0, 'last_opened': 'Never'}
     try:
@@ -202,14 +259,48 @@ def convert_file():
     base_name = os.path.splitext(input_filename)[0]
     conversion_function = None
     output_filename = ""
+    pdf_options = {}
     
     # --- INTELLIGENT DISPATCHER LOGIC ---
     if input_filename.lower().endswith('.pdf'):
         output_filename = f"{base_name}_converted.pptx"
-        conversion_function = CONVERSION_STRATEGIES.get('pdf_to_ppt')
+        strategy = PDF_CONVERSION_MODES.get(data.get('mode'), 'pdf_to_ppt')
+        conversion_function = CONVERSION_STRATEGIES.get(strategy)
+        try:
+            pdf_options = {'dpi': number_field(data, 'dpi', int, 150, 1, MAX_REQUEST_DPI),
+                           'page_cache': PAGE_CACHE_FOLDER,
+                           'max_megapixels': number_field(data, 'max_megapixels', float, MAX_PAGE_MEGAPIXELS,
+                                                          0.01, MAX_REQUEST_MEGAPIXELS),
+                           'encoder': data.get('encoder', 'png'),
+                           'quality': number_field(data, 'quality', int, DEFAULT_JPEG_QUALITY, 1, 100)}
+            # Optional memory budget (MB) for this conversion and its worker processes
+            if data.get('memory_limit_mb'):
+                pdf_options['memory_limit_mb'] = number_field(data, 'memory_limit_mb', float, None, 1)
+                pdf_options['scratch_dir'] = SCRATCH_FOLDER
+            # Optional output size budget (MB): DPI and encoding are lowered to fit it
+            if data.get('max_output_mb'):
+                pdf_options['max_output_mb'] = number_field(data, 'max_output_mb', float, None, 0.01)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid conversion options: {e}'}), 400
+        if pdf_options['encoder'] not in ENCODERS:
+            return jsonify({'error': f"Invalid conversion options: 'encoder' must be one of {', '.join(ENCODERS)}"}), 400
+        if strategy != 'pdf_to_ppt_image':
+            pdf_options['image_passthrough'] = bool(data.get('image_passthrough', False))
+            pdf_options['native_tables'] = bool(data.get('native_tables', False))
+        # Opt-in: previews are a second, small render of every page
+        if data.get('previews', False):
+            pdf_options['preview_size'] = PREVIEW_SIZE
+        # Optional page selection, e.g. "1-20, 45, 100-110"; checked against the page count later
+        if data.get('pages'):
+            try:
+                parse_page_ranges(data['pages'])
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': f'Invalid page selection: {e}'}), 400
+            pdf_options['pages'] = data['pages']
     elif input_filename.lower().endswith(('.ppt', '.pptx')):
         output_filename = f"{base_name}_converted.pdf"
-        conversion_function = CONVERSION_STRATEGIES.get('ppt_to_pdf')
+        strategy = 'ppt_to_pdf'
+        conversion_function = CONVERSION_STRATEGIES.get(strategy)
     else:
         return jsonify({'error': 'Unsupported file type for this converter.'}), 400
 
@@ -218,19 +309,57 @@ def convert_file():
     if not conversion_function:
         return jsonify({'error': 'Internal error: No conversion strategy found.'}), 500
 
+    try:
+        partial_slides = number_field(data, 'partial_slides', int, 0, 0)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid conversion options: {e}'}), 400
+
+    expire_previews()
     conversion_id = str(uuid.uuid4())
     active_conversions[conversion_id] = {'status': 'processing', 'progress': 0, 'total': 0, 'output_file': output_filename}
+    conversion_previews[conversion_id] = {}
+
+    # Optional "first N slides" deck, downloadable before the whole conversion is done
+    partial_filename = f"{base_name}_first{partial_slides}.pptx" if partial_slides else None
+    partial_path = os.path.join(OUTPUT_FOLDER, partial_filename) if partial_slides else None
     
     def progress_callback(current, total, message="Converting..."): # Add message for future use
         active_conversions[conversion_id]['progress'] = current
         active_conversions[conversion_id]['total'] = total
         active_conversions[conversion_id]['message'] = message
 
+    # Per-stage timings, published in the status as 'stages' while the conversion runs
+    pipeline_stats = PipelineStats()
+
+    def page_callback(page_num, result):
+        active_conversions[conversion_id]['stages'] = pipeline_stats.summary()
+        if result.get('preview'):
+            conversion_previews[conversion_id][page_num + 1] = result['preview']
+            active_conversions[conversion_id]['previews_ready'] = len(conversion_previews[conversion_id])
+        if partial_path and 'partial_file' not in active_conversions[conversion_id] and os.path.exists(partial_path):
+            active_conversions[conversion_id]['partial_file'] = partial_filename
+
     def run_conversion():
         try:
-            # Note: The PDF function takes an extra 'dpi' argument which PPT does not.
+            # Same file, same strategy and options: hand out the earlier result
+            cache_key = conversion_cache.key(input_path, strategy, pdf_options)
+            if conversion_cache.get(cache_key, output_path):
+                # The finished deck is there at once, so nothing is made on the way
+                skipped = [name for name, wanted in (('partial_slides', partial_slides),
+                                                     ('previews', pdf_options.get('preview_size'))) if wanted]
+                message = 'Taken from the cache'
+                if skipped:
+                    message += f"; {' and '.join(skipped)} not produced"
+                active_conversions[conversion_id].update({'status': 'completed', 'progress': 1, 'total': 1,
+                                                          'cached': True, 'message': message})
+                return
+
+            # Note: The PDF function takes extra rendering/output arguments which PPT does not.
             if input_filename.lower().endswith('.pdf'):
-                error = conversion_function(input_path, output_path, progress_callback, dpi=150)
+                error = conversion_function(input_path, output_path, progress_callback, workers=CONVERSION_WORKERS, streaming=True,
+                                            page_callback=page_callback, partial_path=partial_path,
+                                            partial_slides=partial_slides, pipeline_stats=pipeline_stats,
+                                            **pdf_options)
             else:
                 error = conversion_function(input_path, output_path, progress_callback)
 
@@ -238,11 +367,18 @@ def convert_file():
                 active_conversions[conversion_id]['status'] = 'error'
                 active_conversions[conversion_id]['error'] = error
             else:
+                conversion_cache.put(cache_key, output_path)
+                if partial_path and os.path.exists(partial_path):
+                    active_conversions[conversion_id]['partial_file'] = partial_filename
+                if input_filename.lower().endswith('.pdf'):
+                    active_conversions[conversion_id]['stages'] = pipeline_stats.summary()
                 active_conversions[conversion_id]['status'] = 'completed'
                 active_conversions[conversion_id]['progress'] = active_conversions[conversion_id].get('total', 1)
         except Exception as e:
             active_conversions[conversion_id]['status'] = 'error'
             active_conversions[conversion_id]['error'] = str(e)
+        finally:
+            active_conversions[conversion_id]['finished_at'] = datetime.now().timestamp()
 
     thread = threading.Thread(target=run_conversion, daemon=True)
     thread.start()
@@ -252,6 +388,17 @@ def convert_file():
 def get_conversion_status(conversion_id):
     if conversion_id not in active_conversions: return jsonify({'error': 'Conversion not found'}), 404
     return jsonify(active_conversions[conversion_id])
+
+@app.route('/api/conversion/<conversion_id>/preview/<int:page_number>', methods=['GET'])
+def get_conversion_preview(conversion_id, page_number):
+    expire_previews()
+    preview = conversion_previews.get(conversion_id, {}).get(page_number)
+    if preview is None: return jsonify({'error': 'Preview not ready'}), 404
+    return send_file(io.BytesIO(preview), mimetype='image/jpeg')
+
+@app.route('/api/conversion-cache', methods=['GET'])
+def get_conversion_cache_stats():
+    return jsonify(conversion_cache.stats())
     
 # --- NEW SLIDER MODULE ENDPOINTS ---
 
@@ -327,10 +474,14 @@ def cleanup_files():
         for filename in os.listdir(OUTPUT_FOLDER):
             filepath = os.path.join(OUTPUT_FOLDER, filename)
             if os.path.getmtime(filepath) < datetime.now().timestamp() - 86400: os.remove(filepath)
+        for conversion_id in list(conversion_previews):
+            if active_conversions.get(conversion_id, {}).get('status') != 'processing': del conversion_previews[conversion_id]
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    # Needed so the page-rendering worker processes start in the frozen build
+    multiprocessing.freeze_support()
     print("Please ensure the Ollama application is running in the background.")
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,248 @@
+# Save this file as backend/backend_cache.py
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+import threading
+
+# Total size the cached outputs may take before the least recently used go.
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024
+_HASH_CHUNK = 1024 * 1024
+
+_REFERENCE = re.compile(r'(\d+) \d+ R')
+_ENCODING_KEYS = re.compile(r'/(?:Filter|DecodeParms|Length)'
+                            r'(?:\s*\d+\s+\d+\s+R|\s*/\w+|\s*\[[^\]]*\]|\s*<<[^>]*>>|\s*\d+)')
+# Page attributes that change how an otherwise identical page looks
+_PAGE_KEYS = ('MediaBox', 'CropBox', 'Rotate', 'Resources', 'Group')
+# Changed whenever the layout of a cached page result changes, so older
+# entries are no longer looked up. 2: spans are a SpanTable. 3: 'tables'.
+PAGE_RESULT_VERSION = 3
+# Changed whenever the converters write a different deck for the same input
+# and options, so decks written by older code are no longer handed out.
+CONVERSION_RESULT_VERSION = 1
+# Converter arguments that change how a conversion runs or what it reports
+# on the way, not the deck it writes; left out of conversion keys
+RUNTIME_ARGUMENTS = ('page_cache', 'scratch_dir', 'memory_limit_mb', 'preview_size')
+
+
+def file_digest(path):
+    """Returns the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _object_digest(doc, xref, memo, active):
+    """
+    Hashes a PDF object together with everything it references, with every
+    'n 0 R' replaced by the referenced object's own digest. Equal content
+    gives equal digests even when the objects got different numbers, as
+    happens when a document is saved again after an edit.
+    """
+    if xref in memo:
+        return memo[xref]
+    if xref in active:
+        return 'cycle'
+    active.add(xref)
+    source = doc.xref_object(xref, compressed=True)
+    is_stream = doc.xref_is_stream(xref)
+    if is_stream:
+        # Filter and Length describe the encoding, not the content
+        source = _ENCODING_KEYS.sub('', source)
+    source = _REFERENCE.sub(lambda match: _object_digest(doc, int(match.group(1)), memo, active), source)
+    digest = hashlib.sha256(source.encode())
+    if is_stream:
+        # Decoded, so re-compressing a stream on save does not count as a change
+        digest.update(doc.xref_stream(xref) or b'')
+    active.discard(xref)
+    memo[xref] = digest.hexdigest()
+    return memo[xref]
+
+
+def _inherited_key(doc, xref, key):
+    """Looks a page attribute up on the page and then on its parent page tree nodes."""
+    seen = set()
+    while xref and xref not in seen:
+        seen.add(xref)
+        value = doc.xref_get_key(xref, key)
+        if value[0] != 'null':
+            return value
+        parent = doc.xref_get_key(xref, 'Parent')
+        xref = int(parent[1].split()[0]) if parent[0] == 'xref' else 0
+    return ('null', 'null')
+
+
+def page_fingerprint(page, memo):
+    """
+    Returns a digest of everything that decides how a page converts: its
+    size and rotation, content streams and resources (fonts, images, forms),
+    hashed all the way down. 'memo' holds object digests for the document
+    and must be filled before the document is changed in memory.
+    """
+    doc = page.parent
+    digest = hashlib.sha256(repr((tuple(page.rect), page.rotation)).encode())
+    for key in _PAGE_KEYS:
+        kind, value = _inherited_key(doc, page.xref, key)
+        if kind == 'xref':
+            value = _object_digest(doc, int(value.split()[0]), memo, set())
+        else:
+            value = _REFERENCE.sub(lambda match: _object_digest(doc, int(match.group(1)), memo, set()), value)
+        digest.update(f"{key}={value};".encode())
+    for xref in page.get_contents():
+        digest.update(_object_digest(doc, xref, memo, set()).encode())
+    return digest.hexdigest()
+
+
+class _DiskCache:
+    """
+    Files in one directory, trimmed to max_bytes by deleting the least
+    recently used (the modification time is refreshed on every hit).
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _lookup(self, key):
+        """Returns the path stored under key, counting the hit or miss."""
+        path = self._path(key)
+        with self._lock:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return path
+
+    def _store(self, key, write):
+        """Calls write(temp_path) and moves the file into place under key."""
+        temp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        write(temp_path)
+        os.replace(temp_path, self._path(key))
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def trim(self):
+        """Deletes the least recently used entries until the cache fits max_bytes."""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            # Always keep the newest entry, even if it alone is over the limit
+            while total > self.max_bytes and len(entries) > 1:
+                _, size, name = entries.pop(0)
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        """Returns the hit/miss counters and the current size of the cache."""
+        with self._lock:
+            entries = self._entries()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+            }
+
+
+class ConversionCache(_DiskCache):
+    """
+    Keeps finished conversion outputs on disk, keyed by the input's content
+    hash plus the strategy and options, so converting the same file the
+    same way again is a file copy. The cache survives restarts; when it
+    grows past max_bytes the least recently used outputs are deleted.
+    Safe to use from several request threads.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_BYTES):
+        super().__init__(directory, max_bytes)
+        # Left over from a crash in the middle of put()
+        for name in os.listdir(directory):
+            if name.endswith('.tmp'):
+                os.remove(os.path.join(directory, name))
+
+    def key(self, input_path, strategy, options=None):
+        """
+        Returns the cache key of converting input_path with a strategy and
+        converter arguments; RUNTIME_ARGUMENTS do not count.
+        """
+        options = {name: value for name, value in (options or {}).items() if name not in RUNTIME_ARGUMENTS}
+        settings = json.dumps({'strategy': strategy, 'options': options}, sort_keys=True)
+        return hashlib.sha256(f"{CONVERSION_RESULT_VERSION}:{file_digest(input_path)}:{settings}".encode()).hexdigest()
+
+    def get(self, key, output_path):
+        """Copies the cached output for key to output_path. Returns False on a miss."""
+        path = self._lookup(key)
+        if path is None:
+            return False
+        shutil.copyfile(path, output_path)
+        return True
+
+    def put(self, key, output_path):
+        """Stores a finished output under key, then trims the cache to max_bytes."""
+        self._store(key, lambda temp_path: shutil.copyfile(output_path, temp_path))
+        self.trim()
+
+
+class PageCache(_DiskCache):
+    """
+    Keeps the converted result of single pages (encoded background, text
+    spans, drawings, pictures), keyed by page_fingerprint() and the
+    conversion options. A revised document only has its changed pages
+    processed again. Worker processes share it through the directory;
+    call trim() once a conversion is done.
+    """
+
+    def key(self, fingerprint, options):
+        """Returns the cache key of a page with the given fingerprint and options."""
+        settings = json.dumps(options, sort_keys=True, default=str)
+        return hashlib.sha256(f"{PAGE_RESULT_VERSION}:{fingerprint}:{settings}".encode()).hexdigest()
+
+    def get(self, key):
+        """Returns the cached page result for key, or None."""
+        path = self._lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def put(self, key, result):
+        """Stores one page result under key."""
+        def write(temp_path):
+            with open(temp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._store(key, write)
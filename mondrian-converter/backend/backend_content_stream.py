@@ -0,0 +1,241 @@
+# Save this file as backend/backend_content_stream.py
+import re
+
+# --- PDF content stream lexing ---
+_WHITESPACE = rb'\x00\t\n\x0c\r '
+_TOKEN = re.compile(rb'[' + _WHITESPACE + rb']*(?:'
+                    rb'(?P<comment>%[^\r\n]*)'
+                    rb'|(?P<string>\()'
+                    rb'|(?P<dict><<|>>)'
+                    rb'|(?P<hex><[^>]*>)'
+                    rb'|(?P<name>/[^' + _WHITESPACE + rb'()<>\[\]{}/%]*)'
+                    rb'|(?P<array>[\[\]{}])'
+                    rb'|(?P<word>[^' + _WHITESPACE + rb'()<>\[\]{}/%]+)'
+                    rb')')
+_STRING_SPECIAL = re.compile(rb'[()\\]')
+_INLINE_IMAGE_END = re.compile(rb'[' + _WHITESPACE + rb']EI(?=[' + _WHITESPACE + rb']|$)')
+
+# Text render modes 0-3 paint (or hide) glyphs, 4-7 additionally add them to
+# the clipping path. Mapping to 3 / 7 hides the text but keeps any clipping.
+_HIDDEN_RENDER_MODE = {mode: b'3' if mode < 4 else b'7' for mode in range(8)}
+
+
+def _skip_string(data, pos):
+    """Returns the position just after the literal string starting at data[pos] == '('."""
+    depth = 0
+    while True:
+        match = _STRING_SPECIAL.search(data, pos)
+        if match is None:
+            return len(data)
+        char = match.group()
+        pos = match.end()
+        if char == b'\\':
+            pos += 1
+        elif char == b'(':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos
+
+
+def iter_tokens(data):
+    """
+    Yields (kind, start, end) for every token of a content stream, where kind
+    is one of the _TOKEN group names. Strings and inline image data are
+    skipped as a whole so their bytes are never mistaken for operators.
+    """
+    pos = 0
+    length = len(data)
+    while pos < length:
+        match = _TOKEN.match(data, pos)
+        if match is None or match.lastgroup is None:
+            break
+        kind = match.lastgroup
+        start = match.start(kind)
+        if kind == 'string':
+            end = _skip_string(data, start)
+        else:
+            end = match.end()
+        yield kind, start, end
+        pos = end
+        if kind == 'word' and data[start:end] == b'ID':
+            image_end = _INLINE_IMAGE_END.search(data, pos + 1)
+            pos = image_end.start() if image_end else length
+
+
+def hide_text_operators(data):
+    """
+    Rewrites every 'n Tr' operator in a content stream to an invisible render
+    mode. Returns the new stream, or None if the stream sets no render mode.
+    """
+    if b'Tr' not in data:
+        return None
+    replacements = []
+    operand = None
+    for kind, start, end in iter_tokens(data):
+        if kind != 'word':
+            operand = None
+            continue
+        word = data[start:end]
+        if word == b'Tr' and operand is not None:
+            try:
+                mode = int(data[operand[0]:operand[1]])
+            except ValueError:
+                mode = 0
+            replacements.append((operand[0], operand[1], _HIDDEN_RENDER_MODE.get(mode, b'3')))
+        operand = (start, end)
+    if not replacements:
+        return None
+    return splice(data, replacements)
+
+
+def splice(data, replacements):
+    """Applies (start, end, value) replacements, sorted by position, to data."""
+    pieces = []
+    pos = 0
+    for start, end, value in replacements:
+        pieces.append(data[pos:start])
+        pieces.append(value)
+        pos = end
+    pieces.append(data[pos:])
+    return b''.join(pieces)
+
+
+# --- Image placement ---
+_PATH_CONSTRUCTION = {b'm', b'l', b'c', b'v', b'y', b'h'}
+_PATH_PAINTING = {b'n', b'f', b'F', b'f*', b'S', b's', b'B', b'B*', b'b', b'b*'}
+# Marks a clip that is not a single axis-aligned rectangle
+COMPLEX_CLIP = 'complex'
+
+
+def _multiply(m, n):
+    """Returns the PDF matrix product m x n of two (a, b, c, d, e, f) tuples."""
+    a, b, c, d, e, f = m
+    na, nb, nc, nd, ne, nf = n
+    return (a * na + b * nc, a * nb + b * nd,
+            c * na + d * nc, c * nb + d * nd,
+            e * na + f * nc + ne, e * nb + f * nd + nf)
+
+
+def _axis_aligned_rect(ctm, x, y, w, h):
+    """Maps a rectangle through ctm, or returns None if ctm rotates or skews it."""
+    a, b, c, d, e, f = ctm
+    if b or c:
+        return None
+    xs = (a * x + e, a * (x + w) + e)
+    ys = (d * y + f, d * (y + h) + f)
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _intersect(clip, rect):
+    if clip is None:
+        return rect
+    return (max(clip[0], rect[0]), max(clip[1], rect[1]),
+            min(clip[2], rect[2]), min(clip[3], rect[3]))
+
+
+def iter_xobject_draws(streams):
+    """
+    Follows the graphics state through a page's content streams (in order,
+    as one page) and yields (stream_index, start, end, name, ctm, clip) for
+    every '/Name Do'. start:end spans the whole operation. clip is None,
+    the clipping rectangle in PDF space, or COMPLEX_CLIP. Only 're' clips
+    are tracked; anything else counts as complex.
+    """
+    ctm = (1, 0, 0, 1, 0, 0)
+    clip = None
+    stack = []
+    path_rects = []
+    path_complex = False
+    for index, data in enumerate(streams):
+        operands = []
+        for kind, start, end in iter_tokens(data):
+            if kind != 'word':
+                operands.append((kind, start, end))
+                continue
+            word = data[start:end]
+            if word[:1].isdigit() or word[:1] in b'+-.':
+                operands.append((kind, start, end))
+                continue
+            if word == b'q':
+                stack.append((ctm, clip))
+            elif word == b'Q':
+                if stack:
+                    ctm, clip = stack.pop()
+            elif word == b'cm' and len(operands) >= 6:
+                try:
+                    matrix = tuple(float(data[s:e]) for _, s, e in operands[-6:])
+                except ValueError:
+                    matrix = None
+                if matrix:
+                    ctm = _multiply(matrix, ctm)
+            elif word == b're' and len(operands) >= 4:
+                try:
+                    path_rects.append(tuple(float(data[s:e]) for _, s, e in operands[-4:]))
+                except ValueError:
+                    path_complex = True
+            elif word in _PATH_CONSTRUCTION:
+                path_complex = True
+            elif word in (b'W', b'W*'):
+                rect = None
+                if len(path_rects) == 1 and not path_complex and clip != COMPLEX_CLIP:
+                    rect = _axis_aligned_rect(ctm, *path_rects[0])
+                clip = COMPLEX_CLIP if rect is None else _intersect(clip, rect)
+            elif word in _PATH_PAINTING:
+                path_rects = []
+                path_complex = False
+            elif word == b'Do' and operands and operands[-1][0] == 'name':
+                _, name_start, name_end = operands[-1]
+                yield index, name_start, end, data[name_start + 1:name_end], ctm, clip
+            operands = []
+
+
+def remove_ranges(data, ranges):
+    """Blanks out (start, end) ranges of a content stream."""
+    return splice(data, [(start, end, b' ') for start, end in sorted(ranges)])
+
+
+def suppress_page_text(page, processed_xrefs):
+    """
+    Makes all text on the page invisible so rendering it yields only the
+    background. The page's content streams start with '3 Tr' (invisible
+    text) and every render mode change, in the page or in the form
+    XObjects it draws, is rewritten to stay invisible. Only the in-memory
+    document is changed. Streams already handled are tracked in
+    processed_xrefs, since forms are often shared between pages.
+    """
+    doc = page.parent
+    content_xrefs = page.get_contents()
+    if not content_xrefs:
+        return
+    form_xrefs = [item[0] for item in page.get_xobjects()]
+
+    for xref in content_xrefs + form_xrefs:
+        if xref in processed_xrefs:
+            continue
+        processed_xrefs.add(xref)
+        stream = hide_text_operators(doc.xref_stream(xref))
+        if stream is not None:
+            doc.update_stream(xref, stream, compress=False)
+
+    # The initial render mode; forms inherit it from the page.
+    first = content_xrefs[0]
+    doc.update_stream(first, b'3 Tr\n' + doc.xref_stream(first), compress=False)
+
+
+def find_operators(page, operators):
+    """
+    Returns which of the given operators (as bytes) occur in the page's
+    content streams or in the form XObjects it draws.
+    """
+    doc = page.parent
+    found = set()
+    for xref in page.get_contents() + [item[0] for item in page.get_xobjects()]:
+        data = doc.xref_stream(xref)
+        if not data or not any(operator in data for operator in operators):
+            continue
+        for kind, start, end in iter_tokens(data):
+            if kind == 'word' and data[start:end] in operators:
+                found.add(data[start:end])
+    return found
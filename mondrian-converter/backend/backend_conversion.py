@@ -1,169 +1,884 @@
 # Save this file as backend_conversion.py (FIXED VERSION)
+"""
+PDF -> PPTX and PPTX -> PDF conversion.
+
+Options of the PDF -> PPTX converters:
+
+dpi                  Resolution of the background on the slide; each page gets
+                     as many pixels as the slide has at that DPI, whatever its
+                     own size, up to max_megapixels per page (None: no limit).
+max_tile_megapixels  Larger pages are rendered and encoded in tiles of at most
+                     this size (None: in one piece).
+workers              Processes rendering pages in parallel (None: every CPU
+                     core, shared with other conversions; see WorkerSlots).
+streaming            Write each slide to the .pptx as soon as it is done.
+text_removal         How text is taken out of the background: 'filter' hides
+                     it in the content streams, 'redact' redacts it. The PDF on
+                     disk is never touched.
+encoder, quality     One of ENCODERS for backgrounds; quality applies to JPEG.
+skip_blank           Flat-colour pages get a slide fill instead of a picture.
+text_grouping        One of TEXT_GROUPINGS: a text box per line by default.
+max_drawings         Pages with no images and at most this many vector paths
+                     become native shapes instead of a background.
+image_passthrough    Embedded images are placed with their original bytes and
+                     left out of the background.
+native_tables        Ruled tables become native tables (see find_tables).
+page_cache           Directory of a PageCache; unchanged pages of a revised
+                     document are taken from it.
+page_callback        page_callback(page_num, result) as each slide is added;
+                     with preview_size, result carries a JPEG 'preview' that
+                     many pixels on its long side.
+partial_path,        The first partial_slides slides are also saved at
+partial_slides       partial_path as soon as they are done.
+pages                Pages to convert, e.g. "1-20, 45" or a list of 1-based
+                     numbers (see parse_page_ranges); all by default.
+pipeline_stats       PipelineStats the stage timings and counts are added to.
+memory_limit_mb      Resident memory the conversion and its workers aim to stay
+                     under (see MemoryBudget); images wait in scratch_dir.
+max_output_mb        dpi, encoder and quality are lowered so the deck is
+                     expected to fit in this many MB (see OutputSizeBudget).
+"""
 
 import fitz
-from pptx import Presentation
+from pptx.dml.color import RGBColor
 from pptx.util import Pt, Inches
+import hashlib
 import io
+import math
+import multiprocessing
+import os
+import threading
 import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from backend_cache import PageCache, page_fingerprint
+from backend_content_stream import suppress_page_text
+from backend_geometry import merge_rects, pad_rects, to_emus
+from backend_image_encoder import DEFAULT_JPEG_QUALITY, EncodedImageCache, EncoderStats, encode_pixmap
+from backend_image_passthrough import pass_through_images
+from backend_memory_budget import MB, MemoryBudget, process_rss, release_memory, spill
+from backend_page_selection import parse_page_ranges
+from backend_pipeline_stats import PageTimer, PipelineStats
+from backend_pptx_writer import open_presentation_writer
+from backend_size_budget import OutputSizeBudget, pick_probe_pages, pick_sample_pages
+from backend_span_table import SpanTable
+from backend_tables import add_table, find_tables
+from backend_text_layout import group_spans
+from backend_vector_shapes import MAX_VECTOR_DRAWINGS, add_drawing, extract_drawings
 
 POINTS_TO_EMUS = 12700
+# Pages handed to a worker at a time; small enough to keep progress smooth.
+PAGES_PER_TASK = 8
+# Workers are started fresh rather than forked: the web backend converts in
+# threads, and forking a multi-threaded process can deadlock the child.
+_MP_CONTEXT = multiprocessing.get_context('spawn')
+# Text removal edits the open document in memory, and MuPDF keeps every
+# edited page's streams until the document is closed; it is reopened after
+# this many pages so memory does not grow with the page count.
+DOC_REOPEN_PAGES = 32
+# Resolution of the probe render used to spot blank backgrounds.
+BLANK_PROBE_DPI = 24
+# Upper bound on the pixels rendered for one page, whatever its size.
+MAX_PAGE_MEGAPIXELS = 16
+# Pages bigger than this are rendered and encoded in tiles of at most this
+# size, so no pixmap ever holds the whole page (3 bytes per pixel).
+MAX_TILE_MEGAPIXELS = 4
+# Redaction boxes reach this many points past each span
+REDACTION_PADDING = 2
+# Only text is redacted: images stay, and so does line art on PyMuPDF
+# versions that would otherwise remove what a redaction covers.
+_REDACT_OPTIONS = {'images': fitz.PDF_REDACT_IMAGE_NONE}
+if hasattr(fitz, 'PDF_REDACT_LINE_ART_NONE'):
+    _REDACT_OPTIONS['graphics'] = fitz.PDF_REDACT_LINE_ART_NONE
+# Page previews are small JPEGs; they only need to be recognisable.
+PREVIEW_JPEG_QUALITY = 70
+# Options that change how a conversion runs or what it reports on the way,
+# not the slides it produces
+_RUNTIME_OPTIONS = ('page_cache', 'scratch_dir', 'memory_limit', 'preview_size')
 
-def convert_pdf_to_ppt_hybrid(pdf_path, ppt_path, progress_callback, dpi=150):
+def _extract_spans(page):
     """
-    Converts PDF to a hybrid PPT using a robust in-memory redaction method.
-    The 'dpi' parameter controls the quality and speed of background rendering.
+    Returns the text spans to overlay on the slide for one page, as a
+    SpanTable: image blocks are not extracted, only the span fields the
+    slides use are kept, and spans are clipped to the page.
     """
     try:
-        original_doc = fitz.open(pdf_path)
-        if original_doc.page_count == 0:
-            return "The selected PDF is empty."
-        
-        # Extract text data from all pages
-        original_text_data = []
-        for page in original_doc:
+        return SpanTable.from_page(page).clip(tuple(page.rect))
+    except Exception as e:
+        print(f"Warning: Could not extract text from page {page.number}: {e}")
+        return SpanTable.empty()
+
+
+def _redact_text(page, spans):
+    """
+    Redacts the text spans from the page so only the background renders.
+    The padded span boxes are merged into line and block rectangles first
+    (see merge_rects): a dense page needs a handful of annotations instead
+    of one per span. The redactions remove text and paint nothing, so the
+    larger rectangles leave the rest of the background as it was.
+    """
+    if not spans:
+        return
+    boxes = pad_rects(spans.bboxes, REDACTION_PADDING)
+    for redaction_rect in merge_rects(boxes):
+        page.add_redact_annot(fitz.Rect(*redaction_rect), fill=False)
+    
+    page.apply_redactions(**_REDACT_OPTIONS)
+
+
+def _suppress_text(page, spans, text_removal, processed_xrefs):
+    """
+    Removes the text layer from the page before the background is rendered.
+    'filter' makes the text invisible in the content streams, which is much
+    cheaper than 'redact' (one redaction annotation per span) on dense pages.
+    """
+    try:
+        if text_removal == 'filter':
             try:
-                text_dict = page.get_text("dict")
-                original_text_data.append(text_dict)
+                suppress_page_text(page, processed_xrefs)
+                return
             except Exception as e:
-                print(f"Warning: Could not extract text from page {page.number}: {e}")
-                original_text_data.append({"blocks": []})
-        
-        # Create clean document by redacting text
-        clean_doc_in_memory = fitz.open()
-        for page_num, page in enumerate(original_doc):
+                print(f"Warning: Could not filter text on page {page.number}, redacting instead: {e}")
+        _redact_text(page, spans)
+    except Exception as e:
+        # The background will still render, just with the text baked in
+        print(f"Warning: Could not process page {page.number}: {e}")
+
+
+def _page_dpi(page, options):
+    """
+    Picks the render resolution for one page: as many pixels as the slide
+    has at options['dpi'], so a poster-sized page is rendered at a lower
+    resolution than a letter-sized one, but never more than
+    options['max_megapixels'].
+    """
+    width, height = page.rect.width, page.rect.height
+    slide_width, slide_height = options['slide_size']
+    scale = math.sqrt((slide_width / POINTS_TO_EMUS / width) * (slide_height / POINTS_TO_EMUS / height))
+    dpi = options['dpi'] * scale
+    if options['max_megapixels']:
+        page_square_inches = (width / 72) * (height / 72)
+        dpi = min(dpi, math.sqrt(options['max_megapixels'] * 1e6 / page_square_inches))
+    return dpi
+
+
+def _tile_grid(width, height, max_tile_pixels):
+    """
+    Splits a width x height pixel area into tiles of at most max_tile_pixels.
+    Returns (tile_width, tile_height); full-width bands where possible.
+    """
+    if width * height <= max_tile_pixels:
+        return width, height
+    tile_width = width
+    if width * 64 > max_tile_pixels:
+        # Too wide for bands of a useful height; use square-ish tiles
+        tile_width = max(int(math.sqrt(max_tile_pixels)), 1)
+    return tile_width, max(max_tile_pixels // tile_width, 1)
+
+
+def _iter_tiles(display_list, rect, dpi, max_tile_megapixels, skip_blank):
+    """
+    Renders the display list tile by tile and yields (pixmap, bbox), with
+    bbox as fractions (x0, y0, x1, y1) of the page. Only one tile's pixmap
+    exists at a time. With skip_blank, plain white tiles are left out.
+    """
+    zoom = dpi / 72
+    matrix = fitz.Matrix(zoom, zoom)
+    width = max(int(math.ceil(rect.width * zoom)), 1)
+    height = max(int(math.ceil(rect.height * zoom)), 1)
+    if not max_tile_megapixels:
+        yield display_list.get_pixmap(matrix=matrix), (0, 0, 1, 1)
+        return
+    tile_width, tile_height = _tile_grid(width, height, int(max_tile_megapixels * 1e6))
+    if (tile_width, tile_height) == (width, height):
+        yield display_list.get_pixmap(matrix=matrix), (0, 0, 1, 1)
+        return
+
+    for top in range(0, height, tile_height):
+        bottom = min(top + tile_height, height)
+        for left in range(0, width, tile_width):
+            right = min(left + tile_width, width)
+            clip = fitz.Rect(rect.x0 + left / zoom, rect.y0 + top / zoom,
+                             rect.x0 + right / zoom, rect.y0 + bottom / zoom)
+            pix = display_list.get_pixmap(matrix=matrix, clip=clip)
+            if skip_blank and pix.color_count() == 1 and pix.pixel(0, 0)[:3] == (255, 255, 255):
+                continue
+            yield pix, (left / width, top / height, right / width, bottom / height)
+
+
+def _render_background(page, dpi, skip_blank, has_images=None, max_tile_megapixels=MAX_TILE_MEGAPIXELS):
+    """
+    Renders the page without annotations or links. Returns (tiles, None),
+    where tiles is an iterator of (pixmap, bbox) from _iter_tiles, or
+    (None, (r, g, b)) when skip_blank is set and the page is a single
+    flat colour: pages with no images get a tiny probe render from the same
+    display list first, so blank pages never pay for the full-size render.
+    'has_images' overrides what page.get_images() says, for pages whose
+    images were taken out. Pages over 'max_tile_megapixels' are rendered in
+    tiles (None renders every page in one piece).
+    """
+    if has_images is None:
+        has_images = bool(page.get_images())
+    display_list = page.get_displaylist(annots=False)
+    if skip_blank and not has_images:
+        zoom = BLANK_PROBE_DPI / 72
+        probe = display_list.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        # The last row and column only partly cover the page, so anti-aliasing
+        # blends them with white; leave them out of the comparison.
+        inner = fitz.IRect(0, 0, max(probe.width - 1, 1), max(probe.height - 1, 1))
+        if probe.color_count(clip=inner) == 1:
+            return None, probe.pixel(0, 0)[:3]
+    return _iter_tiles(display_list, page.rect, dpi, max_tile_megapixels, skip_blank), None
+
+
+def _render_preview(page, size):
+    """Renders a JPEG thumbnail of the page as it looks in the PDF, 'size' pixels on its long side."""
+    zoom = size / max(page.rect.width, page.rect.height)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), annots=False)
+    return encode_pixmap(pix, 'jpeg', PREVIEW_JPEG_QUALITY)[0]
+
+
+def _render_page(page, options, processed_xrefs, encoded_cache):
+    """
+    Runs one page through the whole pipeline: extract its text, suppress the
+    text, render and encode the background. Returns plain, picklable data so
+    it can be produced in a worker process: the background as 'tiles' of
+    encoded images (or a flat 'fill' colour), 'spans', 'tables', 'drawings',
+    'pictures', an optional 'preview', and the 'timings' and 'counts' of a
+    PageTimer. Without 'editable_text' the page is rendered as is.
+    """
+    timer = PageTimer()
+    preview = None
+    if options['preview_size']:
+        try:
+            with timer.stage('preview'):
+                preview = _render_preview(page, options['preview_size'])
+        except Exception as e:
+            print(f"Warning: Could not render a preview of page {page.number}: {e}")
+
+    drawings = None
+    if options['max_drawings']:
+        try:
+            with timer.stage('drawings'):
+                drawings = extract_drawings(page, options['max_drawings'])
+        except Exception as e:
+            print(f"Warning: Could not read drawings on page {page.number}: {e}")
+
+    spans = SpanTable.empty()
+    if options['editable_text']:
+        with timer.stage('text_extraction'):
+            spans = _extract_spans(page)
+        timer.count('spans', len(spans))
+    # Tables are found before the text is taken out of the page; their spans
+    # are still removed from the background but not overlaid as text boxes
+    tables, overlay_spans = [], spans
+    if options['native_tables'] and len(spans):
+        try:
+            with timer.stage('tables'):
+                tables, in_table = find_tables(page, spans)
+                overlay_spans = spans.select(~in_table)
+        except Exception as e:
+            print(f"Warning: Could not find tables on page {page.number}: {e}")
+        timer.count('tables', len(tables))
+    if drawings is not None:
+        timer.count('drawings', len(drawings))
+        return {'tiles': [], 'fill': None, 'spans': overlay_spans, 'tables': tables, 'drawings': drawings,
+                'pictures': [], 'preview': preview, 'timings': timer.timings, 'counts': timer.counts}
+
+    pictures, has_images = [], None
+    if options['image_passthrough']:
+        try:
+            with timer.stage('image_passthrough'):
+                pictures, has_images = pass_through_images(page)
+        except Exception as e:
+            print(f"Warning: Could not pass images through on page {page.number}: {e}")
+        timer.count('pictures', len(pictures))
+        timer.count('image_bytes', sum(len(picture['image']) for picture in pictures))
+    if options['editable_text']:
+        with timer.stage('text_removal'):
+            _suppress_text(page, spans, options['text_removal'], processed_xrefs)
+    tiles, fill = [], None
+    try:
+        with timer.stage('render'):
+            rendered, fill = _render_background(page, _page_dpi(page, options), options['skip_blank'],
+                                                has_images, options['max_tile_megapixels'])
+            rendered = iter(rendered or ())
+        while True:
+            # Tiles are rendered lazily, so rendering happens inside next()
+            with timer.stage('render'):
+                tile = next(rendered, None)
+            if tile is None:
+                break
+            pix, bbox = tile
+            with timer.stage('encode'):
+                image, encode_info = encoded_cache.encode(pix, options['encoder'], options['quality'])
+            tiles.append({'image': image, 'encode_info': encode_info, 'bbox': bbox})
+            if options.get('sample_encodings'):
+                # Only when sampling for an OutputSizeBudget, see _sample_pages
+                tiles[-1]['sample_bytes'] = [len(image)] + [
+                    len(encode_pixmap(pix, encoder, quality)[0])
+                    for encoder, quality in options['sample_encodings'][1:]]
+            timer.count('tiles')
+            timer.count('image_bytes', len(image))
+            del pix, tile
+    except Exception as e:
+        print(f"Warning: Could not render page {page.number}: {e}")
+    return {'tiles': tiles, 'fill': fill, 'spans': overlay_spans, 'tables': tables, 'drawings': None,
+            'pictures': pictures, 'preview': preview, 'timings': timer.timings, 'counts': timer.counts}
+
+
+def _spill_media(result, scratch_dir, timer):
+    """Moves the page's encoded tiles and pictures out of memory into files in scratch_dir."""
+    if not scratch_dir:
+        return
+    with timer.stage('spill'):
+        for item in result['tiles'] + result['pictures']:
             try:
-                # Get text data for this page
-                if page_num < len(original_text_data):
-                    page_text_data = original_text_data[page_num]
-                else:
-                    page_text_data = {"blocks": []}
-                
-                # Redact text blocks
-                for block in page_text_data.get("blocks", []):
-                    if block.get('type') == 0:  # Text block
-                        for line in block.get('lines', []):
-                            for span in line.get('spans', []):
-                                if 'bbox' in span:
-                                    redaction_rect = fitz.Rect(span['bbox'])
-                                    redaction_rect.x0 -= 2
-                                    redaction_rect.y0 -= 2
-                                    redaction_rect.x1 += 2
-                                    redaction_rect.y1 += 2
-                                    page.add_redact_annot(redaction_rect)
-                
-                # Apply redactions
-                page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
-                
-                # Insert page WITHOUT copying links/annotations to avoid index errors
-                clean_doc_in_memory.insert_pdf(
-                    original_doc, 
-                    from_page=page.number, 
-                    to_page=page.number,
-                    links=False,  # Don't copy links
-                    annots=False  # Don't copy annotations
-                )
-            except Exception as e:
-                print(f"Warning: Could not process page {page_num}: {e}")
-                # Try inserting without links/annotations
+                item['image'] = spill(item['image'], scratch_dir)
+            except OSError as e:
+                print(f"Warning: Could not spill an image to {scratch_dir}: {e}")
+                return
+
+
+def _image_source(image):
+    """add_picture() input for a tile or picture 'image': its bytes or a spilled file's path."""
+    return image if isinstance(image, str) else io.BytesIO(image)
+
+
+def _release_media(result):
+    """Deletes the files a page's images were spilled to, once its slide is written."""
+    for item in result['tiles'] + result['pictures']:
+        if isinstance(item['image'], str):
+            try:
+                os.remove(item['image'])
+            except OSError:
+                pass
+
+
+def _iter_pages(pdf_path, page_nums, options):
+    """
+    Yields the result of each page in page_nums as soon as it is done.
+    Only the current page is loaded; it is released before the next starts,
+    and the document is reopened every DOC_REOPEN_PAGES pages to drop the
+    in-memory edits of the pages before.
+    With options['page_cache'] (a directory), pages converted before with
+    the same content and options are read back from the PageCache instead;
+    their results have 'cached' set and only the cache lookup (and the
+    preview, which is not cached) in 'timings'.
+    With options['scratch_dir'], encoded images are written to files there
+    and 'image' holds the file's path (see _release_media). With
+    options['memory_limit'], MuPDF's caches are emptied whenever this
+    process grows past that many bytes.
+    """
+    encoded_cache = EncodedImageCache()
+    page_cache, fingerprints, cache_options = None, {}, None
+    if options['page_cache']:
+        page_cache = PageCache(options['page_cache'])
+        cache_options = {key: value for key, value in options.items() if key not in _RUNTIME_OPTIONS}
+    doc = None
+    try:
+        for count, page_num in enumerate(page_nums):
+            if count % DOC_REOPEN_PAGES == 0:
+                if doc is not None:
+                    doc.close()
+                doc, processed_xrefs = fitz.open(pdf_path), set()
+            timer = PageTimer()
+            with timer.stage('load_page'):
+                page = doc.load_page(page_num)
+            cache_key = None
+            if page_cache is not None:
                 try:
-                    clean_doc_in_memory.insert_pdf(
-                        original_doc, 
-                        from_page=page.number, 
-                        to_page=page.number,
-                        links=False,
-                        annots=False
-                    )
-                except Exception as e2:
-                    print(f"Error: Could not insert page {page_num} at all: {e2}")
-                    # Create a blank page as fallback
-                    clean_doc_in_memory.new_page(
-                        width=page.rect.width,
-                        height=page.rect.height
-                    )
-        
-        original_doc.close()
+                    # Before _render_page, which changes the document in memory
+                    with timer.stage('page_cache'):
+                        cache_key = page_cache.key(page_fingerprint(page, fingerprints), cache_options)
+                        result = page_cache.get(cache_key)
+                    if result is not None:
+                        result = dict(result, cached=True, timings=timer.timings)
+                        if options['preview_size']:
+                            # Previews are not part of the cache key, nor kept in it
+                            try:
+                                with timer.stage('preview'):
+                                    result['preview'] = _render_preview(page, options['preview_size'])
+                            except Exception as e:
+                                print(f"Warning: Could not render a preview of page {page_num}: {e}")
+                        _spill_media(result, options['scratch_dir'], timer)
+                        yield result
+                        del page
+                        continue
+                except Exception as e:
+                    print(f"Warning: Page cache unavailable for page {page_num}: {e}")
+            result = _render_page(page, options, processed_xrefs, encoded_cache)
+            if cache_key is not None:
+                try:
+                    with timer.stage('page_cache'):
+                        page_cache.put(cache_key, dict(result, preview=None))
+                except Exception as e:
+                    print(f"Warning: Could not cache page {page_num}: {e}")
+            timer.timings.update(result['timings'])
+            result = dict(result, cached=False, timings=timer.timings)
+            _spill_media(result, options['scratch_dir'], timer)
+            yield result
+            del page
+            if options['memory_limit'] and (process_rss() or 0) > options['memory_limit']:
+                release_memory()
+    finally:
+        if doc is not None:
+            doc.close()
 
-        # Create PowerPoint presentation
-        prs = Presentation()
-        
-        # Set slide dimensions based on first page
-        if len(clean_doc_in_memory) > 0:
-            first_page = clean_doc_in_memory.load_page(0)
-            prs.slide_width = int(first_page.rect.width * POINTS_TO_EMUS)
-            prs.slide_height = int(first_page.rect.height * POINTS_TO_EMUS)
-
-        # Process each page
-        for page_num, page in enumerate(clean_doc_in_memory):
+
+def _render_pages(pdf_path, page_nums, options):
+    """
+    Renders the given pages of the PDF. This runs inside worker processes,
+    so it opens its own copy of the document.
+    """
+    return list(_iter_pages(pdf_path, page_nums, options))
+
+
+class WorkerSlots:
+    """
+    Caps the worker processes of all the conversions running in this
+    process at 'limit' together. acquire() hands out what is free; a
+    conversion that gets fewer than two workers converts in its own
+    process instead of starting a pool.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, wanted):
+        """Takes up to 'wanted' slots and returns how many were taken: none, or two or more."""
+        with self._lock:
+            granted = min(wanted, self.limit - self._in_use)
+            if granted < 2:
+                return 0
+            self._in_use += granted
+            return granted
+
+    def release(self, count):
+        with self._lock:
+            self._in_use -= count
+
+
+# Shared by every conversion in this process; the web backend sets its limit
+worker_slots = WorkerSlots(os.cpu_count() or 1)
+
+
+def _iter_page_results(pdf_path, page_nums, options, workers, budget=None):
+    """
+    Yields (page_num, result) for every page in page_nums, in that order.
+    Pages that are not listed are never loaded. With one worker pages stream
+    straight through the pipeline; with more, batches of pages are rendered
+    in a process pool with at most two batches queued per worker, and
+    results are still consumed in order. Workers are taken from
+    worker_slots, so concurrent conversions share its limit. With a
+    MemoryBudget, no new batch is queued while the conversion is over the
+    budget's high-water mark.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    batches = [page_nums[start:start + PAGES_PER_TASK]
+               for start in range(0, len(page_nums), PAGES_PER_TASK)]
+    workers = worker_slots.acquire(min(workers, len(batches))) if workers > 1 else 0
+
+    try:
+        if workers <= 1:
+            for page_num, result in zip(page_nums, _iter_pages(pdf_path, page_nums, options)):
+                yield page_num, result
+                if budget is not None and budget.exceeded():
+                    release_memory()
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT) as executor:
+            if budget is not None:
+                budget.attach(executor)
+            pending = deque()
+            for batch in batches:
+                # Backpressure: hand out finished batches before queueing another
+                while pending and (len(pending) >= 2 * workers
+                                   or (budget is not None and budget.exceeded())):
+                    done, future = pending.popleft()
+                    yield from zip(done, future.result())
+                pending.append((batch, executor.submit(_render_pages, pdf_path, batch, options)))
+            while pending:
+                done, future = pending.popleft()
+                yield from zip(done, future.result())
+    finally:
+        worker_slots.release(workers)
+
+
+def _add_background(slide, writer, result):
+    """
+    Places the rendered page image across the whole slide, tile by tile for
+    oversized pages, or for a blank page sets the slide background to its
+    colour (white needs nothing).
+    """
+    for tile in result['tiles']:
+        x0, y0, x1, y1 = tile['bbox']
+        left, top = int(x0 * writer.slide_width), int(y0 * writer.slide_height)
+        slide.shapes.add_picture(
+            _image_source(tile['image']), left, top,
+            width=int(x1 * writer.slide_width) - left,
+            height=int(y1 * writer.slide_height) - top
+        )
+    if result['fill'] is not None and result['fill'] != (255, 255, 255):
+        fill = slide.background.fill
+        fill.solid()
+        fill.fore_color.rgb = RGBColor(*result['fill'])
+
+
+def _add_pictures(slide, result):
+    """Places the images passed through from the PDF at their page positions."""
+    for picture in result['pictures']:
+        x0, y0, x1, y1 = picture['bbox']
+        slide.shapes.add_picture(
+            _image_source(picture['image']),
+            int(x0 * POINTS_TO_EMUS), int(y0 * POINTS_TO_EMUS),
+            width=int((x1 - x0) * POINTS_TO_EMUS), height=int((y1 - y0) * POINTS_TO_EMUS)
+        )
+
+
+def _add_text_box(slide, box, emus):
+    """
+    Adds one text box with a paragraph per line and a run per span. 'emus'
+    is the box's (left, top, width, height), see to_emus().
+    """
+    txBox = slide.shapes.add_textbox(*emus)
+    
+    txBox.fill.background()
+    txBox.line.fill.background()
+    
+    text_frame = txBox.text_frame
+    text_frame.margin_left = 0
+    text_frame.margin_right = 0
+    text_frame.margin_top = 0
+    text_frame.margin_bottom = 0
+    
+    for line_num, line in enumerate(box['lines']):
+        p = text_frame.paragraphs[0] if line_num == 0 else text_frame.add_paragraph()
+        if box['line_pitch']:
+            # Keep the PDF's line spacing rather than the font's default
+            p.line_spacing = Pt(box['line_pitch'])
+        for span in line:
+            run = p.add_run()
+            run.text = span['text']
+            
+            font = run.font
+            font.size = Pt(int(span['size']))
+            
+            if span['bold']:
+                font.bold = True
+
+
+def _add_hybrid_slide(writer, result, page_num, text_grouping, timer):
+    """
+    Adds one slide with the rendered background, or the page's vector
+    shapes, and editable text overlays. Each step is timed on 'timer'.
+    """
+    slide = writer.add_slide()
+    if result['drawings'] is not None:
+        with timer.stage('shapes'):
+            for drawing in result['drawings']:
+                try:
+                    add_drawing(slide, drawing)
+                except Exception as e:
+                    print(f"Warning: Could not add a drawing on page {page_num}: {e}")
+    else:
+        with timer.stage('place_background'):
+            _add_background(slide, writer, result)
+    with timer.stage('place_pictures'):
+        _add_pictures(slide, result)
+    if result['tables']:
+        with timer.stage('table_shapes'):
+            for table in result['tables']:
+                try:
+                    add_table(slide, table)
+                except Exception as e:
+                    print(f"Warning: Could not add a table on page {page_num}: {e}")
+
+    # Add text overlays
+    with timer.stage('text_layout'):
+        boxes = group_spans(result['spans'], text_grouping)
+        # Positions of every box on the page in one batch
+        box_emus = to_emus([box['bbox'] for box in boxes]).tolist()
+    timer.count('text_boxes', len(boxes))
+    with timer.stage('text_boxes'):
+        for box, emus in zip(boxes, box_emus):
             try:
-                # Render page to image
-                pix = page.get_pixmap(dpi=dpi)
-                
-                # Create slide
-                slide = prs.slides.add_slide(prs.slide_layouts[6])
-                slide.shapes.add_picture(
-                    io.BytesIO(pix.tobytes("png")), 0, 0,
-                    width=prs.slide_width, height=prs.slide_height
-                )
-
-                # Add text overlays if available
-                if page_num < len(original_text_data):
-                    page_text_data = original_text_data[page_num]
-                    
-                    for block in page_text_data.get("blocks", []):
-                        if block.get('type') == 0:  # Text block
-                            for line in block.get('lines', []):
-                                for span in line.get('spans', []):
-                                    try:
-                                        # Validate span has required fields
-                                        if not all(key in span for key in ['bbox', 'text', 'size']):
-                                            continue
-                                        
-                                        x0, y0, x1, y1 = span['bbox']
-                                        
-                                        # Add text box
-                                        txBox = slide.shapes.add_textbox(
-                                            int(x0 * POINTS_TO_EMUS), 
-                                            int(y0 * POINTS_TO_EMUS),
-                                            int((x1 - x0) * POINTS_TO_EMUS), 
-                                            int((y1 - y0) * POINTS_TO_EMUS)
-                                        )
-                                        
-                                        txBox.fill.background()
-                                        txBox.line.fill.background()
-                                        
-                                        p = txBox.text_frame.paragraphs[0]
-                                        p.margin_left = 0
-                                        p.margin_right = 0
-                                        p.margin_top = 0
-                                        p.margin_bottom = 0
-                                        
-                                        run = p.add_run()
-                                        run.text = span.get('text', '')
-                                        
-                                        font = run.font
-                                        font.size = Pt(int(span.get('size', 12)))
-                                        
-                                        # Check for bold font
-                                        if 'font' in span and "bold" in span['font'].lower():
-                                            font.bold = True
-                                    except Exception as e:
-                                        print(f"Warning: Could not add text span on page {page_num}: {e}")
-                                        continue
-                
-                progress_callback(page_num + 1, len(clean_doc_in_memory))
+                _add_text_box(slide, box, emus)
             except Exception as e:
-                print(f"Warning: Error processing page {page_num}: {e}")
-                progress_callback(page_num + 1, len(clean_doc_in_memory))
+                print(f"Warning: Could not add text on page {page_num}: {e}")
                 continue
 
-        prs.save(ppt_path)
-        clean_doc_in_memory.close()
+    with timer.stage('write_slide'):
+        writer.finish_slide(slide)
+
+
+def _count_page(encoder_stats, result):
+    """Adds a page's encoding info to the stats. Returns 1 if it came from the page cache."""
+    if result['cached']:
+        return 1
+    for tile in result['tiles']:
+        encoder_stats.add(tile['encode_info'])
+    return 0
+
+
+def _page_timer(result):
+    """Returns a PageTimer carrying on from the timings the page result brought along."""
+    return PageTimer(result.get('timings'), result.get('counts'))
+
+
+def _open_memory_budget(memory_limit_mb, scratch_dir, workers, max_tile_megapixels):
+    """
+    Returns (budget, workers, max_tile_megapixels): a MemoryBudget of
+    memory_limit_mb with the worker count and tile size it allows, or None
+    and the settings unchanged when there is no limit.
+    """
+    if not memory_limit_mb:
+        return None, workers, max_tile_megapixels
+    budget = MemoryBudget(memory_limit_mb * MB, scratch_dir)
+    workers, max_tile_megapixels = budget.plan(workers, max_tile_megapixels)
+    return budget, workers, max_tile_megapixels
+
+
+def _sample_pages(pdf_path, page_nums, options, dpi, encodings):
+    """
+    Converts the given pages at dpi in the first of encodings and returns
+    their results, each tile with its 'sample_bytes' in every one of
+    encodings. Nothing is cached, previewed or spilled.
+    """
+    (encoder, quality), *_ = encodings
+    sample_options = dict(options, dpi=dpi, encoder=encoder, quality=quality, sample_encodings=encodings,
+                          page_cache=None, preview_size=0, scratch_dir=None, memory_limit=None)
+    with fitz.open(pdf_path) as doc:
+        processed_xrefs, encoded_cache = set(), EncodedImageCache()
+        return [_render_page(doc.load_page(page_num), sample_options, processed_xrefs, encoded_cache)
+                for page_num in page_nums]
+
+
+def _background_signatures(pdf_path, page_nums, options):
+    """
+    Hashes of the given pages' backgrounds, rendered without their text at
+    BLANK_PROBE_DPI: pages with the same hash get the same background image.
+    """
+    signatures = []
+    zoom = BLANK_PROBE_DPI / 72
+    with fitz.open(pdf_path) as doc:
+        processed_xrefs = set()
+        for page_num in page_nums:
+            page = doc.load_page(page_num)
+            if options['editable_text']:
+                _suppress_text(page, _extract_spans(page), options['text_removal'], processed_xrefs)
+            probe = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), annots=False)
+            signatures.append(hashlib.sha1(probe.samples_mv).digest())
+    return signatures
+
+
+def _fit_output_size(pdf_path, page_nums, options, max_output_mb):
+    """
+    Returns an OutputSizeBudget of max_output_mb planned from a few sample
+    pages, and sets options' 'dpi', 'encoder' and 'quality' to the setting
+    it picked; None, with options unchanged, when there is no budget.
+    """
+    if not max_output_mb:
+        return None
+    size_budget = OutputSizeBudget(max_output_mb * MB)
+    with fitz.open(pdf_path) as doc:
+        sample_nums = pick_sample_pages(doc, page_nums)
+    signatures = _background_signatures(pdf_path, pick_probe_pages(page_nums), options)
+
+    def measure(dpi, encodings):
+        return _sample_pages(pdf_path, sample_nums, options, dpi, encodings)
+
+    options['dpi'], options['encoder'], options['quality'] = size_budget.plan(
+        measure, len(page_nums), signatures, options['dpi'], options['encoder'], options['quality'])
+    if not size_budget.fits:
+        print(f"Warning: No setting fits the {max_output_mb} MB output budget; "
+              f"using the smallest one tried ({options['dpi']} DPI, {options['encoder']})")
+    return size_budget
+
+
+def _check_output_size(size_budget, ppt_path):
+    """Records the size of the deck written at ppt_path with the output size budget and warns if it is over."""
+    if size_budget is None:
+        return
+    size_budget.record(os.path.getsize(ppt_path))
+    if not size_budget.fits:
+        print(f"Warning: The deck is {size_budget.actual_bytes / MB:.1f} MB, over the "
+              f"{size_budget.limit_bytes / MB:g} MB output budget")
+
+
+def _finish_page_cache(page_cache, cached_pages, page_count):
+    """Reports page cache reuse and trims the cache after a conversion."""
+    if not page_cache:
+        return
+    print(f"Page cache: reused {cached_pages} of {page_count} pages")
+    try:
+        PageCache(page_cache).trim()
+    except Exception as e:
+        print(f"Warning: Could not trim the page cache: {e}")
+
+
+def _convert_pdf(pdf_path, ppt_path, progress_callback, options, add_slide, slide_size=None, workers=1,
+                 streaming=False, page_callback=None, partial_path=None, partial_slides=0, pages=None,
+                 pipeline_stats=None, memory_limit_mb=None, scratch_dir=None, max_output_mb=None):
+    """
+    Runs a PDF -> PPTX conversion for the converters below: selects the
+    pages, fits the memory and output size budgets, hands every page's
+    result to add_slide(writer, result, page_num, timer) in page order,
+    saves the deck and logs what it took. options holds the _render_page
+    settings; slide_size defaults to the first selected page's size.
+    Returns an error message, or None.
+    """
+    stats = pipeline_stats if pipeline_stats is not None else PipelineStats()
+    budget = None
+    try:
+        with fitz.open(pdf_path) as doc:
+            if doc.page_count == 0:
+                return "The selected PDF is empty."
+            try:
+                page_nums = parse_page_ranges(pages, doc.page_count)
+            except ValueError as e:
+                return f"Invalid page selection: {e}"
+            if slide_size is None:
+                first_page_rect = doc.load_page(page_nums[0]).rect
+                slide_size = (int(first_page_rect.width * POINTS_TO_EMUS),
+                              int(first_page_rect.height * POINTS_TO_EMUS))
+        page_count = len(page_nums)
+
+        budget, workers, options['max_tile_megapixels'] = _open_memory_budget(
+            memory_limit_mb, scratch_dir, workers, options['max_tile_megapixels'])
+        streaming = streaming or budget is not None
+        options.update(slide_size=slide_size,
+                       scratch_dir=budget.scratch_dir if budget else None,
+                       memory_limit=budget.process_limit() if budget else None)
+        with stats.stage('size_budget'):
+            size_budget = _fit_output_size(pdf_path, page_nums, options, max_output_mb)
+        encoder_stats = EncoderStats()
+        cached_pages = 0
+
+        with open_presentation_writer(ppt_path, *slide_size, streaming=streaming,
+                                      partial_path=partial_path, partial_slides=partial_slides) as writer:
+            for slide_num, (page_num, result) in enumerate(
+                    _iter_page_results(pdf_path, page_nums, options, workers, budget)):
+                timer = _page_timer(result)
+                add_slide(writer, result, page_num, timer)
+                _release_media(result)
+                cached_pages += _count_page(encoder_stats, result)
+                stats.add_page(page_num, timer, result['cached'])
+                if page_callback:
+                    page_callback(page_num, result)
+                progress_callback(slide_num + 1, page_count)
+
+            with stats.stage('save'):
+                writer.save()
+        _check_output_size(size_budget, ppt_path)
+        _finish_page_cache(options['page_cache'], cached_pages, page_count)
+        stats.finish()
+        print(f"Image encoding: {encoder_stats.summary()}")
+        print(f"Pipeline timing: {stats.summary()}")
+        if size_budget is not None:
+            print(f"Output size budget: {size_budget.summary()}")
+        if budget is not None:
+            print(f"Memory budget: {budget.summary()}")
         return None
+    finally:
+        if budget is not None:
+            budget.close()
+
+
+def _add_image_slide(writer, result, page_num, timer):
+    slide = writer.add_slide()
+    with timer.stage('place_background'):
+        _add_background(slide, writer, result)
+    with timer.stage('write_slide'):
+        writer.finish_slide(slide)
+
+
+def convert_pdf_to_ppt_hybrid(pdf_path, ppt_path, progress_callback, dpi=150, workers=1,
+                              streaming=False, text_removal='filter', encoder='png',
+                              quality=DEFAULT_JPEG_QUALITY, skip_blank=True,
+                              text_grouping='line', max_drawings=0, image_passthrough=False,
+                              max_megapixels=MAX_PAGE_MEGAPIXELS,
+                              max_tile_megapixels=MAX_TILE_MEGAPIXELS, page_cache=None,
+                              preview_size=0, page_callback=None, partial_path=None, partial_slides=0,
+                              pages=None, pipeline_stats=None, memory_limit_mb=None, scratch_dir=None,
+                              native_tables=False, max_output_mb=None):
+    """
+    Converts PDF to a hybrid PPT: a text-free background image with editable
+    text boxes on top. Each page goes through extract -> suppress text ->
+    render -> slide on its own, so the first slide is ready right away and
+    memory is bounded by the pages in flight. The options are described at
+    the top of this module.
+    """
+    options = {'dpi': dpi, 'editable_text': True, 'text_removal': text_removal,
+               'encoder': encoder, 'quality': quality, 'skip_blank': skip_blank,
+               'max_drawings': max_drawings, 'image_passthrough': image_passthrough,
+               'native_tables': native_tables, 'max_megapixels': max_megapixels,
+               'max_tile_megapixels': max_tile_megapixels, 'page_cache': page_cache,
+               'preview_size': preview_size}
+
+    def add_slide(writer, result, page_num, timer):
+        try:
+            _add_hybrid_slide(writer, result, page_num, text_grouping, timer)
+        except Exception as e:
+            print(f"Warning: Error processing page {page_num}: {e}")
+
+    try:
+        return _convert_pdf(pdf_path, ppt_path, progress_callback, options, add_slide, workers=workers,
+                            streaming=streaming, page_callback=page_callback, partial_path=partial_path,
+                            partial_slides=partial_slides, pages=pages, pipeline_stats=pipeline_stats,
+                            memory_limit_mb=memory_limit_mb, scratch_dir=scratch_dir,
+                            max_output_mb=max_output_mb)
     except Exception as e:
         traceback.print_exc()
         return f"Hybrid conversion failed: {str(e)}"
 
 
+def convert_pdf_to_ppt_vector(pdf_path, ppt_path, progress_callback,
+                              max_drawings=MAX_VECTOR_DRAWINGS, **options):
+    """
+    Converts PDF to PPT keeping vector content editable: lines, rectangles,
+    curves and fills become native PowerPoint shapes and text becomes text
+    boxes, so line art and diagrams stay sharp at any zoom and need no
+    rendering. Pages with images, shadings or more than 'max_drawings'
+    paths fall back to the hybrid background image. The other options work
+    as in convert_pdf_to_ppt_hybrid.
+    """
+    return convert_pdf_to_ppt_hybrid(pdf_path, ppt_path, progress_callback,
+                                     max_drawings=max_drawings, **options)
+
+
+def convert_pdf_to_ppt_image_only(pdf_path, ppt_path, progress_callback, dpi=150, workers=1,
+                                  streaming=False, encoder='png', quality=DEFAULT_JPEG_QUALITY,
+                                  skip_blank=True, max_megapixels=MAX_PAGE_MEGAPIXELS,
+                                  max_tile_megapixels=MAX_TILE_MEGAPIXELS, page_cache=None,
+                                  preview_size=0, page_callback=None, partial_path=None,
+                                  partial_slides=0, pages=None, pipeline_stats=None,
+                                  memory_limit_mb=None, scratch_dir=None, max_output_mb=None):
+    """
+    Converts each PDF page to a non-editable image on a PPT slide.
+    The 'dpi' parameter controls the quality and speed; the other options
+    are described at the top of this module.
+    """
+    options = {'dpi': dpi, 'editable_text': False, 'text_removal': None,
+               'encoder': encoder, 'quality': quality, 'skip_blank': skip_blank,
+               'max_drawings': 0, 'image_passthrough': False, 'native_tables': False,
+               'max_megapixels': max_megapixels, 'max_tile_megapixels': max_tile_megapixels,
+               'page_cache': page_cache, 'preview_size': preview_size}
+    try:
+        return _convert_pdf(pdf_path, ppt_path, progress_callback, options, _add_image_slide,
+                            slide_size=(Inches(16), Inches(9)), workers=workers, streaming=streaming,
+                            page_callback=page_callback, partial_path=partial_path,
+                            partial_slides=partial_slides, pages=pages, pipeline_stats=pipeline_stats,
+                            memory_limit_mb=memory_limit_mb, scratch_dir=scratch_dir,
+                            max_output_mb=max_output_mb)
+    except Exception as e:
+        traceback.print_exc()
+        return f"Image-only conversion failed: {str(e)}"
+
+
 def convert_ppt_to_pdf(ppt_path, pdf_path, progress_callback):
     """
     Converts a PowerPoint file (.ppt or .pptx) to PDF.
@@ -202,5 +917,7 @@ def convert_ppt_to_pdf(ppt_path, pdf_path, progress_callback):
 
 CONVERSION_STRATEGIES = {
     'pdf_to_ppt': convert_pdf_to_ppt_hybrid,
+    'pdf_to_ppt_image': convert_pdf_to_ppt_image_only,
+    'pdf_to_ppt_vector': convert_pdf_to_ppt_vector,
     'ppt_to_pdf': convert_ppt_to_pdf,
 }
\ No newline at end of file
@@ -0,0 +1,170 @@
+# Save this file as backend/backend_geometry.py
+import numpy as np
+
+POINTS_TO_EMUS = 12700
+# Rects closer than this many points count as touching when merging.
+MERGE_TOLERANCE = 0.5
+
+
+def as_rects(rects):
+    """Returns rects (an iterable of (x0, y0, x1, y1)) as an (n, 4) float array."""
+    return np.asarray(rects, dtype=float).reshape(-1, 4)
+
+
+def pad_rects(rects, padding):
+    """Grows every rect by padding points on all four sides."""
+    return as_rects(rects) + np.array([-padding, -padding, padding, padding])
+
+
+def clip_rects(rects, bounds):
+    """
+    Clips every rect to bounds (x0, y0, x1, y1). Returns the clipped rects
+    and a mask of those that still have an area; a rect entirely outside
+    bounds collapses onto its edge.
+    """
+    rects = as_rects(rects)
+    x0, y0, x1, y1 = bounds
+    clipped = np.column_stack([np.clip(rects[:, 0], x0, x1), np.clip(rects[:, 1], y0, y1),
+                               np.clip(rects[:, 2], x0, x1), np.clip(rects[:, 3], y0, y1)])
+    visible = (clipped[:, 2] > clipped[:, 0]) & (clipped[:, 3] > clipped[:, 1])
+    return clipped, visible
+
+
+def to_emus(rects):
+    """
+    Converts rects in points to (left, top, width, height) in EMUs as an
+    (n, 4) int64 array, truncating the way int() does.
+    """
+    rects = as_rects(rects)
+    sizes = rects[:, 2:] - rects[:, :2]
+    return (np.column_stack([rects[:, :2], sizes]) * POINTS_TO_EMUS).astype(np.int64)
+
+
+def _bounding_boxes(rects, starts):
+    """Bounding box of each run of rects beginning at the indices in starts."""
+    return np.column_stack([np.minimum.reduceat(rects[:, 0], starts), np.minimum.reduceat(rects[:, 1], starts),
+                            np.maximum.reduceat(rects[:, 2], starts), np.maximum.reduceat(rects[:, 3], starts)])
+
+
+def merge_rects(rects, tolerance=MERGE_TOLERANCE):
+    """
+    Merges overlapping or touching rects into the boxes that cover them,
+    the way span boxes join into lines and lines into blocks. Rects are
+    chained top to bottom into bands while each one reaches into the band
+    above, then every band is cut where nothing spans a horizontal gap.
+    Returns the bounding box of each piece as an (n, 4) array. The boxes
+    may also cover space between the rects (beside a short line), so this
+    suits jobs that only care about what lies inside the rects, such as
+    redacting text.
+    """
+    rects = as_rects(rects)
+    if len(rects) < 2:
+        return rects
+
+    rects = rects[np.argsort(rects[:, 1], kind='stable')]
+    reach = np.maximum.accumulate(rects[:, 3])
+    new_band = np.ones(len(rects), dtype=bool)
+    new_band[1:] = rects[1:, 1] > reach[:-1] + tolerance
+    band = np.cumsum(new_band)
+
+    order = np.lexsort((rects[:, 0], band))
+    rects, band = rects[order], band[order]
+    # Offsetting each band by more than the page size makes the running
+    # maximum start over at every band.
+    offset = band * (np.abs(rects).max() * 2 + 1)
+    reach = np.maximum.accumulate(rects[:, 2] + offset) - offset
+    new_run = np.ones(len(rects), dtype=bool)
+    new_run[1:] = (band[1:] != band[:-1]) | (rects[1:, 0] > reach[:-1] + tolerance)
+    return _bounding_boxes(rects, np.flatnonzero(new_run))
+
+
+class GridIndex:
+    """
+    A spatial index of rects over a uniform grid. Every rect is filed under
+    the grid cells it covers, so query() only tests the rects filed near
+    the area asked about and a page of n rects answers a query in about
+    constant time instead of O(n). Cells are sized to hold about one rect
+    each; rects that would cover more than MAX_CELLS_PER_RECT cells (a
+    background, a frame around the page) are kept in a short list that
+    every query tests.
+
+    Rects with no area never match, and neither does a query rect with no
+    area, as with fitz.Rect.intersects().
+    """
+
+    MAX_GRID_CELLS = 1 << 20
+    MAX_CELLS_PER_RECT = 64
+
+    def __init__(self, rects):
+        self.rects = as_rects(rects)
+        rects = self.rects
+        valid = np.flatnonzero((rects[:, 2] > rects[:, 0]) & (rects[:, 3] > rects[:, 1])
+                               & np.isfinite(rects).all(axis=1))
+        self._nx = self._ny = 0
+        self._large = valid
+        if not len(valid):
+            self._bounds = None
+            return
+        self._bounds = (*rects[valid, :2].min(axis=0), *rects[valid, 2:].max(axis=0))
+
+        # The grid covers where most rects are; anything outside it is filed
+        # under the nearest edge cells, and queries there look in the same cells
+        x0, y0 = np.percentile(rects[valid, :2], 1, axis=0)
+        x1, y1 = np.percentile(rects[valid, 2:], 99, axis=0)
+        x1, y1 = max(x1, x0 + 1), max(y1, y0 + 1)
+        area = (x1 - x0) * (y1 - y0)
+        # About one rect per cell, but no smaller than a typical rect
+        typical = np.median(np.maximum(rects[valid, 2] - rects[valid, 0], rects[valid, 3] - rects[valid, 1]))
+        cell = max(np.sqrt(area / len(valid)), typical, np.sqrt(area / self.MAX_GRID_CELLS))
+        self._origin = (x0, y0)
+        self._cell = cell
+        self._nx = int((x1 - x0) // cell) + 1
+        self._ny = int((y1 - y0) // cell) + 1
+
+        cx0, cy0, cx1, cy1 = self._cell_ranges(rects[valid])
+        spans = (cx1 - cx0 + 1) * (cy1 - cy0 + 1)
+        small = spans <= self.MAX_CELLS_PER_RECT
+        self._large = valid[~small]
+        ids, cx0, cy0, cx1, spans = valid[small], cx0[small], cy0[small], cx1[small], spans[small]
+
+        # One entry per (cell, rect), grouped by cell and in rect order within it
+        owner = np.repeat(np.arange(len(ids)), spans)
+        step = np.arange(len(owner)) - np.repeat(np.cumsum(spans) - spans, spans)
+        width = (cx1 - cx0 + 1)[owner]
+        cells = (cy0[owner] + step // width) * self._nx + cx0[owner] + step % width
+        order = np.argsort(cells, kind='stable')
+        self._entries = ids[owner[order]]
+        self._starts = np.searchsorted(cells[order], np.arange(self._nx * self._ny + 1))
+
+    def _cell_ranges(self, rects):
+        """Grid cells (cx0, cy0, cx1, cy1) covered by each rect, clipped to the grid."""
+        ox, oy = self._origin
+        cx0 = np.clip(np.floor((rects[:, 0] - ox) / self._cell), 0, self._nx - 1)
+        cy0 = np.clip(np.floor((rects[:, 1] - oy) / self._cell), 0, self._ny - 1)
+        cx1 = np.clip(np.floor((rects[:, 2] - ox) / self._cell), 0, self._nx - 1)
+        cy1 = np.clip(np.floor((rects[:, 3] - oy) / self._cell), 0, self._ny - 1)
+        return [value.astype(np.int64) for value in (cx0, cy0, cx1, cy1)]
+
+    def __len__(self):
+        return len(self.rects)
+
+    def query(self, rect):
+        """
+        Returns the indices, in ascending order, of the rects that overlap
+        rect with a non-empty area.
+        """
+        qx0, qy0, qx1, qy1 = rect
+        bounds = self._bounds
+        if (not (qx1 > qx0 and qy1 > qy0) or bounds is None
+                or qx1 <= bounds[0] or bounds[2] <= qx0 or qy1 <= bounds[1] or bounds[3] <= qy0):
+            return np.empty(0, dtype=np.int64)
+        candidates = [self._large]
+        if self._nx:
+            cx0, cy0, cx1, cy1 = (int(value[0]) for value in self._cell_ranges(as_rects(rect)))
+            for cy in range(cy0, cy1 + 1):
+                row = cy * self._nx
+                candidates.append(self._entries[self._starts[row + cx0]:self._starts[row + cx1 + 1]])
+        candidates = np.unique(np.concatenate(candidates))
+        found = self.rects[candidates]
+        hits = (found[:, 0] < qx1) & (qx0 < found[:, 2]) & (found[:, 1] < qy1) & (qy0 < found[:, 3])
+        return candidates[hits]
@@ -0,0 +1,156 @@
+# Save this file as backend/backend_image_encoder.py
+import hashlib
+import io
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+# 'png'  - lossless, what every background used to be
+# 'png8' - palette-quantized PNG (256 colours), great for flat graphics
+# 'jpeg' - lossy, best for photographs; uses the 'quality' setting
+# 'auto' - picks one of the above per page from its content
+ENCODERS = ('png', 'png8', 'jpeg', 'auto')
+
+DEFAULT_JPEG_QUALITY = 85
+
+# Pages with at most this many distinct colours survive palette quantization
+# unharmed; above AUTO_PHOTO_COLORS the page is treated as photographic.
+AUTO_PALETTE_COLORS = 256
+AUTO_PHOTO_COLORS = 20000
+
+_PALETTE_METHOD = getattr(Image, 'Quantize', Image).FASTOCTREE
+
+# Recently encoded renders kept per document, so repeated backgrounds
+# (templates, blank pages, watermarks) are only encoded once.
+ENCODED_CACHE_SIZE = 16
+
+
+def _to_image(pix):
+    return Image.frombytes('L' if pix.n == 1 else 'RGB', (pix.width, pix.height), pix.samples)
+
+
+def _save(image, format, **params):
+    out = io.BytesIO()
+    image.save(out, format=format, **params)
+    return out.getvalue()
+
+
+def _encode_png8(pix):
+    """Quantizes the pixmap to a 256-colour palette and encodes it as PNG."""
+    image = _to_image(pix)
+    if image.mode == 'RGB':
+        image = image.quantize(256, method=_PALETTE_METHOD)
+    return _save(image, 'PNG')
+
+
+def _encode_jpeg(pix, quality):
+    # Pillow's encoder is several times faster than Pixmap.tobytes('jpeg')
+    # and chroma-subsamples, which also makes the files smaller.
+    return _save(_to_image(pix), 'JPEG', quality=quality)
+
+
+def choose_encoder(pix):
+    """Picks an encoder for one page from the number of colours it uses."""
+    colors = pix.color_count()
+    if colors <= AUTO_PALETTE_COLORS:
+        return 'png8'
+    if colors > AUTO_PHOTO_COLORS:
+        return 'jpeg'
+    return 'png'
+
+
+def encode_pixmap(pix, encoder='png', quality=DEFAULT_JPEG_QUALITY):
+    """
+    Encodes a rendered page. Returns (image bytes, info) where info records
+    the format used, the raw and encoded sizes and the time spent, for
+    EncoderStats.
+    """
+    started = time.perf_counter()
+    if encoder == 'auto':
+        encoder = choose_encoder(pix)
+    # Transparency only survives as PNG
+    if pix.alpha or pix.n not in (1, 3):
+        encoder = 'png'
+
+    if encoder == 'jpeg':
+        blob = _encode_jpeg(pix, quality)
+    elif encoder == 'png8':
+        blob = _encode_png8(pix)
+    elif encoder == 'png':
+        blob = pix.tobytes('png')
+    else:
+        raise ValueError(f"Unknown image encoder: {encoder}")
+
+    info = {
+        'format': encoder,
+        'raw_bytes': len(pix.samples),
+        'bytes': len(blob),
+        'seconds': time.perf_counter() - started,
+    }
+    return blob, info
+
+
+class EncodedImageCache:
+    """
+    Remembers the last few encodings by a hash of the rendered pixels. A page
+    that renders to exactly the same pixels as a recent one reuses its bytes.
+    """
+
+    def __init__(self, size=ENCODED_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+
+    def encode(self, pix, encoder='png', quality=DEFAULT_JPEG_QUALITY):
+        """Same as encode_pixmap, but served from the cache when possible."""
+        started = time.perf_counter()
+        key = (hashlib.sha1(pix.samples_mv).digest(), pix.width, pix.height, pix.n, encoder, quality)
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            blob, info = cached
+            return blob, dict(info, reused=True, seconds=time.perf_counter() - started)
+
+        blob, info = encode_pixmap(pix, encoder, quality)
+        self._entries[key] = (blob, info)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        return blob, info
+
+
+class EncoderStats:
+    """
+    Adds up the encoding info of every background image of a conversion
+    (one per page, or one per tile for tiled pages). 'formats' gives the
+    images and encoded bytes of each format, so encoders can be compared
+    with each other rather than with the raw pixels.
+    """
+
+    def __init__(self):
+        self.images = 0
+        self.raw_bytes = 0
+        self.encoded_bytes = 0
+        self.seconds = 0.0
+        self.reused = 0
+        self.formats = {}
+        self.format_bytes = {}
+
+    def add(self, info):
+        self.images += 1
+        self.raw_bytes += info['raw_bytes']
+        self.encoded_bytes += info['bytes']
+        self.seconds += info['seconds']
+        self.reused += info.get('reused', False)
+        self.formats[info['format']] = self.formats.get(info['format'], 0) + 1
+        self.format_bytes[info['format']] = self.format_bytes.get(info['format'], 0) + info['bytes']
+
+    def summary(self):
+        return {
+            'images': self.images,
+            'formats': {name: {'images': count, 'bytes': self.format_bytes[name]}
+                        for name, count in self.formats.items()},
+            'raw_bytes': self.raw_bytes,
+            'encoded_bytes': self.encoded_bytes,
+            'encode_seconds': round(self.seconds, 3),
+            'reused': self.reused,
+        }
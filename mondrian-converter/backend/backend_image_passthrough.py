@@ -0,0 +1,159 @@
+# Save this file as backend/backend_image_passthrough.py
+import fitz
+
+from backend_content_stream import COMPLEX_CLIP, iter_xobject_draws, remove_ranges
+from backend_geometry import GridIndex
+
+# Image formats PowerPoint can show as they come out of the PDF. Everything
+# else (JPEG 2000, JBIG2, CMYK, masked images) stays in the background.
+PASSTHROUGH_FORMATS = ('jpeg', 'png')
+
+# How far, in points, an image may poke out of its clip and still count as
+# unclipped, and how closely its bbox must match the page's paint log.
+BBOX_TOLERANCE = 1.0
+
+_TEXT_PAINTS = ('fill-text', 'stroke-text', 'ignore-text')
+_NO_RECT = (0, 0, 0, 0)
+_INFINITE_RECT = tuple(fitz.INFINITE_RECT())
+
+
+def _index_bboxlog(bboxlog, keep):
+    """
+    GridIndex of the page's paint log, in which only the entries whose kind
+    passes keep() can be found: the others are filed as empty rects, so
+    query() returns bboxlog indices. An infinite bbox intersects nothing,
+    as with fitz.Rect.intersects().
+    """
+    return GridIndex([bbox if keep(kind) and tuple(bbox) != _INFINITE_RECT else _NO_RECT
+                      for kind, bbox in bboxlog])
+
+
+def _is_paint_over(kind):
+    return kind not in _TEXT_PAINTS and kind.startswith(('fill-', 'stroke-'))
+
+
+def _is_drawn_over(paints, index, rect):
+    """
+    True if anything other than text is painted over rect after bboxlog[index].
+    'paints' is the _index_bboxlog() of the non-text paints.
+    """
+    return bool((paints.query(tuple(rect)) > index).any())
+
+
+def _find_paint(bboxlog, image_paints, used, rect):
+    """
+    Returns the index of the unused 'fill-image' entry painting rect, or
+    None. 'image_paints' is the _index_bboxlog() of the image paints.
+    """
+    x0, y0, x1, y1 = rect
+    near = (x0 - BBOX_TOLERANCE, y0 - BBOX_TOLERANCE, x1 + BBOX_TOLERANCE, y1 + BBOX_TOLERANCE)
+    for index in image_paints.query(near).tolist():
+        if index in used:
+            continue
+        if all(abs(a - b) <= BBOX_TOLERANCE for a, b in zip(bboxlog[index][1], rect)):
+            return index
+    return None
+
+
+def _contains(clip, rect):
+    if clip is None:
+        return True
+    if clip == COMPLEX_CLIP:
+        return False
+    return (clip[0] - BBOX_TOLERANCE <= rect[0] and clip[1] - BBOX_TOLERANCE <= rect[1]
+            and rect[2] <= clip[2] + BBOX_TOLERANCE and rect[3] <= clip[3] + BBOX_TOLERANCE)
+
+
+def _extract_original(doc, xref):
+    """Returns (bytes, format) of an image stream if it can be used as is, else None."""
+    if any(doc.xref_get_key(xref, key)[0] != 'null' for key in ('SMask', 'Mask')):
+        return None
+    if doc.xref_get_key(xref, 'ImageMask')[1] == 'true':
+        return None
+    info = doc.extract_image(xref)
+    if not info or info['ext'] not in PASSTHROUGH_FORMATS or info.get('smask'):
+        return None
+    if info.get('colorspace') not in (1, 3):
+        return None
+    return info['image'], info['ext']
+
+
+def _replace_contents(page, content_xrefs, new_streams):
+    """
+    Gives the page new content streams of its own in place of those in
+    new_streams ({index: data}); other pages may share the old streams
+    and still draw what was taken out of them.
+    """
+    doc = page.parent
+    xrefs = list(content_xrefs)
+    for index, data in new_streams.items():
+        xref = doc.get_new_xref()
+        doc.update_object(xref, '<<>>')
+        doc.update_stream(xref, data, compress=False)
+        xrefs[index] = xref
+    doc.xref_set_key(page.xref, 'Contents', '[' + ' '.join(f'{xref} 0 R' for xref in xrefs) + ']')
+
+
+def pass_through_images(page):
+    """
+    Takes the images the page draws directly out of its content streams so
+    they can be placed on the slide as pictures with their original bytes
+    (a JPEG stays the same JPEG). Returns (pictures, images_left), where
+    pictures is a list of {'image', 'format', 'bbox'} in painting order
+    and images_left tells if the page still draws other images.
+
+    An image is only taken out if it is drawn upright and unrotated, is not
+    clipped, has no mask and nothing but text is painted over it later.
+    Images inside form XObjects are left alone. Only the in-memory document
+    is changed, and the page gets copies of the content streams it edits.
+    """
+    if page.rotation:
+        return [], bool(page.get_images())
+    doc = page.parent
+    names = {}
+    for xref, smask, _, _, _, _, _, name, _, referencer in page.get_images(full=True):
+        if referencer == 0 and not smask:
+            names[name.encode()] = xref
+    if not names:
+        return [], bool(page.get_images())
+
+    content_xrefs = page.get_contents()
+    streams = [doc.xref_stream(xref) for xref in content_xrefs]
+    to_page = page.transformation_matrix
+    bboxlog = page.get_bboxlog()
+    # Each image is looked up in the paint log; indexing it keeps pages with
+    # many images and paints from costing images x paints comparisons
+    image_paints = _index_bboxlog(bboxlog, lambda kind: kind == 'fill-image')
+    paints = _index_bboxlog(bboxlog, _is_paint_over)
+    used = set()
+    originals = {}
+    removals = {}
+    pictures = []
+    for index, start, end, name, ctm, clip in iter_xobject_draws(streams):
+        xref = names.get(name)
+        if xref is None:
+            continue
+        a, b, c, d = ctm[:4]
+        if b or c or a <= 0 or d <= 0:
+            continue
+        pdf_rect = (ctm[4], ctm[5], ctm[4] + a, ctm[5] + d)
+        if not _contains(clip, pdf_rect):
+            continue
+        rect = fitz.Rect(pdf_rect) * to_page
+        paint = _find_paint(bboxlog, image_paints, used, rect)
+        if paint is None or _is_drawn_over(paints, paint, rect):
+            continue
+        if xref not in originals:
+            originals[xref] = _extract_original(doc, xref)
+        if originals[xref] is None:
+            continue
+        used.add(paint)
+        image, image_format = originals[xref]
+        pictures.append({'image': image, 'format': image_format, 'bbox': tuple(rect)})
+        removals.setdefault(index, []).append((start, end))
+
+    if removals:
+        _replace_contents(page, content_xrefs, {index: remove_ranges(streams[index], ranges)
+                                                for index, ranges in removals.items()})
+    images_left = sum(kind == 'fill-image' for kind, _ in bboxlog) > len(pictures)
+    return pictures, images_left
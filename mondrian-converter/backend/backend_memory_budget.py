@@ -0,0 +1,155 @@
+# Save this file as backend/backend_memory_budget.py
+import gc
+import os
+import shutil
+import tempfile
+
+import fitz
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 1024 * 1024
+# Resident size of a converter process (Python, PyMuPDF, python-pptx and
+# the template deck) before it has rendered anything.
+PROCESS_BASE_BYTES = 96 * MB
+# Copies of a tile held while it is encoded: the pixmap, the Pillow image
+# and the encoder's output buffer, at 3 bytes per pixel.
+TILE_BYTES_PER_PIXEL = 3 * 3
+# Tiles are not made smaller than this to fit a budget; below it the
+# per-tile overhead costs more than it saves.
+MIN_TILE_MEGAPIXELS = 1
+# Rendering pauses once the conversion's processes together use this
+# fraction of the budget, leaving room for the page being worked on.
+HIGH_WATER = 0.85
+
+
+def process_rss(pid=None):
+    """Returns the resident set size of a process (this one by default) in bytes, or None."""
+    pid = pid or os.getpid()
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            pass
+    return None
+
+
+def release_memory():
+    """Empties MuPDF's resource store (fonts, images, display lists) and runs the garbage collector."""
+    fitz.TOOLS.store_shrink(100)
+    gc.collect()
+
+
+def spill(blob, scratch_dir, suffix=''):
+    """Writes blob to a new file in scratch_dir and returns its path."""
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=scratch_dir)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(blob)
+    return path
+
+
+class MemoryBudget:
+    """
+    Keeps a conversion, worker processes included, under limit_bytes of
+    resident memory. plan() sizes the worker pool and the render tiles to
+    fit the budget; encoded images are spilled to files in scratch_dir
+    instead of being held or passed between processes; exceeded() tells
+    the page loop to stop feeding workers until memory comes down.
+    Without scratch_dir a temporary directory is used and removed by
+    close(). Where resident memory cannot be measured (no /proc and no
+    psutil) the pool and tiles are still sized to the budget, but
+    exceeded() never pauses rendering; a warning says so.
+    """
+
+    def __init__(self, limit_bytes, scratch_dir=None):
+        self.limit_bytes = limit_bytes
+        self.measured = process_rss() is not None
+        if not self.measured:
+            print("Warning: resident memory cannot be measured on this system (install psutil); "
+                  "the memory limit only sizes workers and tiles, rendering will not pause for it")
+        self._own_scratch_dir = scratch_dir is None
+        if scratch_dir is None:
+            scratch_dir = tempfile.mkdtemp(prefix='mondrian_spill_')
+        else:
+            os.makedirs(scratch_dir, exist_ok=True)
+        self.scratch_dir = scratch_dir
+        self.workers = 1
+        self.max_tile_megapixels = None
+        self.waits = 0
+        self.peak_bytes = 0
+        self._executor = None
+
+    def _share(self, workers):
+        # The main process only assembles slides, but counts as one more process
+        return self.limit_bytes / (workers + 1) if workers > 1 else self.limit_bytes
+
+    def plan(self, workers, max_tile_megapixels):
+        """
+        Returns (workers, max_tile_megapixels) that fit the budget: workers
+        are dropped until each process can hold its base size plus one of
+        the smallest tiles being encoded, then tiles are made as large as
+        the remaining room allows, up to the requested size.
+        """
+        workers = max(workers or os.cpu_count() or 1, 1)
+        requested = max_tile_megapixels or float('inf')
+        tile_bytes = MIN_TILE_MEGAPIXELS * 1e6 * TILE_BYTES_PER_PIXEL
+        while workers > 1 and self._share(workers) < PROCESS_BASE_BYTES + tile_bytes:
+            workers -= 1
+        room = self._share(workers) - PROCESS_BASE_BYTES
+        tile_megapixels = max(room / TILE_BYTES_PER_PIXEL / 1e6, MIN_TILE_MEGAPIXELS)
+        self.workers = workers
+        self.max_tile_megapixels = min(requested, round(tile_megapixels, 2))
+        return self.workers, self.max_tile_megapixels
+
+    def process_limit(self):
+        """Memory one process may use before it empties its caches."""
+        return int(HIGH_WATER * self._share(self.workers))
+
+    def attach(self, executor):
+        """Counts the processes of a ProcessPoolExecutor towards the budget from now on."""
+        self._executor = executor
+
+    def used_bytes(self):
+        """Resident memory of this process and the attached worker processes."""
+        total = process_rss() or 0
+        # Only this conversion's own pool: other conversions may run in other threads
+        for pid in list(getattr(self._executor, '_processes', None) or ()):
+            total += process_rss(pid) or 0
+        self.peak_bytes = max(self.peak_bytes, total)
+        return total
+
+    def exceeded(self):
+        """True if the conversion is over its high-water mark; counts as a wait."""
+        if self.used_bytes() <= HIGH_WATER * self.limit_bytes:
+            return False
+        self.waits += 1
+        return True
+
+    def summary(self):
+        return {
+            'limit_mb': round(self.limit_bytes / MB),
+            'peak_mb': round(self.peak_bytes / MB),
+            'workers': self.workers,
+            'max_tile_megapixels': self.max_tile_megapixels,
+            'waits': self.waits,
+            'measured': self.measured,
+        }
+
+    def close(self):
+        if self._own_scratch_dir:
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
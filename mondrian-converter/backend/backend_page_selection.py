@@ -0,0 +1,53 @@
+# Save this file as backend/backend_page_selection.py
+import re
+
+_RANGE = re.compile(r'^(\d+)?\s*(-)?\s*(\d+)?$')
+
+
+def parse_page_ranges(spec, page_count=None):
+    """
+    Turns a page selection such as "1-20, 45, 100-110" into the sorted,
+    0-based numbers of the pages it selects. Page numbers in 'spec' count
+    from 1; "100-" runs to the last page and "-5" from the first. Commas
+    and semicolons separate parts, and pages selected twice count once.
+    'spec' may also be a list of 1-based page numbers. Empty or None
+    selects every page.
+
+    Without 'page_count' only the syntax is checked and None is returned,
+    whatever the selection; with it, the page numbers are returned and
+    pages past the end are an error. Raises ValueError for anything that
+    is not a selection.
+    """
+    if spec is None or (isinstance(spec, str) and not spec.strip()):
+        return list(range(page_count)) if page_count is not None else None
+    if isinstance(spec, (list, tuple)):
+        spec = ','.join(str(int(page)) for page in spec)
+
+    pages = set()
+    for part in re.split(r'[,;]', spec):
+        part = part.strip()
+        if not part:
+            continue
+        match = _RANGE.match(part)
+        if not match or not (match.group(1) or match.group(3)):
+            raise ValueError(f"'{part}' is not a page or page range")
+        first = int(match.group(1)) if match.group(1) else 1
+        if match.group(2):
+            last = int(match.group(3)) if match.group(3) else page_count
+        elif match.group(3):
+            raise ValueError(f"'{part}' is not a page or page range")
+        else:
+            last = first
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"'{part}' is not a valid page range")
+        if page_count is None:
+            continue
+        if last > page_count:
+            raise ValueError(f"Page {last} is past the end of the document ({page_count} pages)")
+        pages.update(range(first - 1, last))
+
+    if page_count is None:
+        return None
+    if not pages:
+        raise ValueError("The page selection is empty")
+    return sorted(pages)
@@ -0,0 +1,107 @@
+# Save this file as backend/backend_pipeline_stats.py
+import heapq
+import time
+from contextlib import contextmanager
+
+# Pages listed in a summary's 'slowest_pages'
+SLOWEST_PAGES = 5
+
+
+class PageTimer:
+    """
+    Collects the wall time of each pipeline stage ('text_extraction',
+    'render', 'encode', ...) and counts ('spans', 'image_bytes', ...) for one
+    page. 'timings' and 'counts' are plain dicts, so they travel with the
+    page result from a worker process.
+    """
+
+    def __init__(self, timings=None, counts=None):
+        self.timings = dict(timings or {})
+        self.counts = dict(counts or {})
+
+    @contextmanager
+    def stage(self, name):
+        """Adds the time spent in the with block to stage 'name'."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - started
+
+    def count(self, name, amount=1):
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+
+class PipelineStats:
+    """
+    Adds up the stage timings and counts of every page of a conversion,
+    plus stages that run once per job (such as 'save'), and keeps the
+    slowest pages. Stage times of pages rendered in parallel workers add
+    up, so with several workers they can exceed 'wall_seconds'.
+    """
+
+    def __init__(self, slowest_pages=SLOWEST_PAGES):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.pages = 0
+        self.cached_pages = 0
+        self.stages = {}
+        self.counts = {}
+        self.slowest_pages = slowest_pages
+        self._slowest = []
+
+    def _add_time(self, name, seconds, per_page):
+        stage = self.stages.setdefault(name, {'seconds': 0.0, 'pages': 0, 'max_seconds': 0.0})
+        stage['seconds'] += seconds
+        if per_page:
+            stage['pages'] += 1
+            stage['max_seconds'] = max(stage['max_seconds'], seconds)
+
+    def add_page(self, page_num, timer, cached=False):
+        """Adds one page's PageTimer."""
+        self.pages += 1
+        self.cached_pages += cached
+        for name, seconds in timer.timings.items():
+            self._add_time(name, seconds, per_page=True)
+        for name, amount in timer.counts.items():
+            self.counts[name] = self.counts.get(name, 0) + amount
+        entry = (sum(timer.timings.values()), page_num, timer.timings)
+        if len(self._slowest) < self.slowest_pages:
+            heapq.heappush(self._slowest, entry)
+        elif entry[0] > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    @contextmanager
+    def stage(self, name):
+        """Times a stage that runs once for the whole job."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_time(name, time.perf_counter() - started, per_page=False)
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def summary(self):
+        """Returns the breakdown as plain data, stages in the order they first ran."""
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = {'seconds': round(stage['seconds'], 3)}
+            if stage['pages']:
+                stages[name].update(pages=stage['pages'],
+                                    ms_per_page=round(stage['seconds'] * 1000 / stage['pages'], 2),
+                                    max_ms=round(stage['max_seconds'] * 1000, 2))
+        slowest = sorted(self._slowest, reverse=True)
+        return {
+            'pages': self.pages,
+            'cached_pages': self.cached_pages,
+            'wall_seconds': round((self.finished or time.perf_counter()) - self.started, 3),
+            'stages': stages,
+            'counts': dict(self.counts),
+            'slowest_pages': [
+                {'page': page_num + 1, 'ms': round(total * 1000, 2),
+                 'stages': {name: round(seconds * 1000, 2) for name, seconds in timings.items()}}
+                for total, page_num, timings in slowest
+            ],
+        }
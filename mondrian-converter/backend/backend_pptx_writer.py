@@ -0,0 +1,249 @@
+# Save this file as backend/backend_pptx_writer.py
+import hashlib
+import os
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+BLANK_LAYOUT_INDEX = 6
+
+CT_NAMESPACE = 'http://schemas.openxmlformats.org/package/2006/content-types'
+RELS_NAMESPACE = 'http://schemas.openxmlformats.org/package/2006/relationships'
+CT_RELS = 'application/vnd.openxmlformats-package.relationships+xml'
+CT_SLIDE = 'application/vnd.openxmlformats-officedocument.presentationml.slide+xml'
+
+# JPEG does not deflate any further, so it is stored as is. PNGs are still
+# deflated: MuPDF writes them with light compression and they shrink a lot.
+STORED_EXTENSIONS = {'jpg', 'jpeg'}
+
+
+def _rels_xml(rels):
+    """Serializes (rId, reltype, target, is_external) tuples into a .rels part."""
+    lines = [f'<Relationships xmlns="{RELS_NAMESPACE}">']
+    for rId, reltype, target, is_external in rels:
+        mode = ' TargetMode="External"' if is_external else ''
+        lines.append(f'<Relationship Id={quoteattr(rId)} Type={quoteattr(reltype)} '
+                     f'Target={quoteattr(target)}{mode}/>')
+    lines.append('</Relationships>')
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n' + ''.join(lines)).encode('utf-8')
+
+
+def _rel_tuples(rels):
+    return [(rel.rId, rel.reltype, rel.target_ref, rel.is_external) for rel in rels.values()]
+
+
+class PresentationWriter:
+    """
+    The default output backend: builds the whole deck with python-pptx and
+    saves it at the end. Simple, but every slide stays in memory until then.
+    python-pptx already stores identical pictures only once.
+    """
+
+    def __init__(self, ppt_path, slide_width, slide_height):
+        self.ppt_path = ppt_path
+        self._prs = Presentation()
+        self._prs.slide_width = slide_width
+        self._prs.slide_height = slide_height
+
+    @property
+    def slide_width(self):
+        return self._prs.slide_width
+
+    @property
+    def slide_height(self):
+        return self._prs.slide_height
+
+    def add_slide(self):
+        return self._prs.slides.add_slide(self._prs.slide_layouts[BLANK_LAYOUT_INDEX])
+
+    def finish_slide(self, slide):
+        pass
+
+    def save(self):
+        self._prs.save(self.ppt_path)
+
+    def abort(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is not None:
+            self.abort()
+        return False
+
+
+class StreamingPresentationWriter(PresentationWriter):
+    """
+    Writes each slide's XML and media into the .pptx zip as soon as the slide
+    is finished, then drops it from the python-pptx object tree. Only the
+    template parts and one slide are ever held in memory, so memory stays
+    flat however many pages the PDF has. save() writes the presentation part,
+    its relationships and [Content_Types].xml to complete the package.
+    Media is deduplicated by content hash: a background repeated on hundreds
+    of slides is stored once and every slide references that one part.
+    """
+
+    def __init__(self, ppt_path, slide_width, slide_height):
+        super().__init__(ppt_path, slide_width, slide_height)
+        self._zip = zipfile.ZipFile(ppt_path, 'w', zipfile.ZIP_DEFLATED)
+        self._content_types = {}  # partname -> content type
+        self._slide_partnames = []
+        self._media_count = 0
+        self._media_by_digest = {}  # sha1 of the blob -> media partname
+
+    def _write(self, partname, blob):
+        ext = partname.rsplit('.', 1)[-1].lower()
+        compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+        self._zip.writestr(partname.lstrip('/'), blob, compress_type=compress_type)
+
+    def finish_slide(self, slide):
+        slide_part = slide.part
+        slide_number = len(self._slide_partnames) + 1
+        slide_partname = f'/ppt/slides/slide{slide_number}.xml'
+
+        # Slide-owned parts (pictures) get fresh names in the output package;
+        # everything else (the layout) already lives in the template.
+        rels = []
+        for rel in slide_part.rels.values():
+            if rel.is_external or rel.reltype == RT.SLIDE_LAYOUT:
+                rels.append((rel.rId, rel.reltype, rel.target_ref, rel.is_external))
+                continue
+            target = rel.target_part
+            if not target.partname.startswith('/ppt/media/'):
+                raise ValueError(f"Streaming writer cannot write {target.partname} parts")
+            digest = hashlib.sha1(target.blob).hexdigest()
+            media_partname = self._media_by_digest.get(digest)
+            if media_partname is None:
+                self._media_count += 1
+                media_partname = f'/ppt/media/image{self._media_count}.{target.partname.ext}'
+                self._write(media_partname, target.blob)
+                self._content_types[media_partname] = target.content_type
+                self._media_by_digest[digest] = media_partname
+            rels.append((rel.rId, rel.reltype, f'../media/{media_partname.rsplit("/", 1)[1]}', False))
+
+        self._write(slide_partname, slide_part.blob)
+        self._write(f'/ppt/slides/_rels/slide{slide_number}.xml.rels', _rels_xml(rels))
+        self._content_types[slide_partname] = CT_SLIDE
+        self._slide_partnames.append(slide_partname)
+
+        # Drop the slide (and with it the picture parts) from the scratch deck
+        sldIdLst = self._prs.slides._sldIdLst
+        for sldId in list(sldIdLst):
+            if self._prs.part.related_slide(sldId.rId) is slide:
+                sldIdLst.remove(sldId)
+                self._prs.part.drop_rel(sldId.rId)
+
+    def save(self):
+        prs_part = self._prs.part
+        prs_rels = _rel_tuples(prs_part.rels)
+
+        # Register the streamed slides with the presentation part
+        next_rId = max(int(rId[3:]) for rId, _, _, _ in prs_rels) + 1
+        sldIdLst = self._prs.slides._sldIdLst
+        for index, slide_partname in enumerate(self._slide_partnames):
+            rId = f'rId{next_rId + index}'
+            prs_rels.append((rId, RT.SLIDE, f'slides/{slide_partname.rsplit("/", 1)[1]}', False))
+            sldIdLst._add_sldId(id=256 + index, rId=rId)
+
+        package = prs_part.package
+        for part in package.iter_parts():
+            self._write(part.partname, part.blob)
+            rels = prs_rels if part is prs_part else _rel_tuples(part.rels)
+            if rels:
+                self._write(part.partname.rels_uri, _rels_xml(rels))
+            self._content_types[part.partname] = part.content_type
+        self._write('/_rels/.rels', _rels_xml(_rel_tuples(package._rels)))
+
+        lines = [f'<Types xmlns="{CT_NAMESPACE}">',
+                 f'<Default Extension="rels" ContentType="{CT_RELS}"/>',
+                 '<Default Extension="xml" ContentType="application/xml"/>']
+        for partname, content_type in self._content_types.items():
+            lines.append(f'<Override PartName={quoteattr(partname)} ContentType={quoteattr(content_type)}/>')
+        lines.append('</Types>')
+        self._zip.writestr('[Content_Types].xml',
+                           '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n' + ''.join(lines))
+        self._zip.close()
+
+    def abort(self):
+        self._zip.close()
+        if os.path.exists(self.ppt_path):
+            os.remove(self.ppt_path)
+
+
+class PartialDeckWriter:
+    """
+    Wraps the output backend and also streams the first slide_count slides
+    into a separate deck at partial_path, which is saved as soon as that
+    many slides are done (or when the full deck is, if it is shorter).
+    The partial deck only appears under its name once it is complete.
+    """
+
+    def __init__(self, writer, partial_path, slide_count):
+        self._writer = writer
+        self.partial_path = partial_path
+        self.slide_count = slide_count
+        self.partial_ready = False
+        self._temp_path = f"{partial_path}.part"
+        self._partial = StreamingPresentationWriter(self._temp_path, writer.slide_width, writer.slide_height)
+        self._slides = 0
+
+    @property
+    def slide_width(self):
+        return self._writer.slide_width
+
+    @property
+    def slide_height(self):
+        return self._writer.slide_height
+
+    def add_slide(self):
+        return self._writer.add_slide()
+
+    def finish_slide(self, slide):
+        # The partial copy reads the slide before the streaming writer drops it
+        if not self.partial_ready:
+            self._partial.finish_slide(slide)
+            self._slides += 1
+            if self._slides >= self.slide_count:
+                self._save_partial()
+        self._writer.finish_slide(slide)
+
+    def _save_partial(self):
+        self._partial.save()
+        os.replace(self._temp_path, self.partial_path)
+        self.partial_ready = True
+
+    def save(self):
+        if not self.partial_ready:
+            self._save_partial()
+        self._writer.save()
+
+    def abort(self):
+        if not self.partial_ready:
+            self._partial.abort()
+        self._writer.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is not None:
+            self.abort()
+        return False
+
+
+def open_presentation_writer(ppt_path, slide_width, slide_height, streaming=False,
+                             partial_path=None, partial_slides=0):
+    """
+    Returns the output backend used by the PDF -> PPTX strategies. With
+    partial_path and partial_slides, the first partial_slides slides are
+    also saved as a deck of their own as soon as they are done.
+    """
+    writer_class = StreamingPresentationWriter if streaming else PresentationWriter
+    writer = writer_class(ppt_path, slide_width, slide_height)
+    if partial_path and partial_slides:
+        writer = PartialDeckWriter(writer, partial_path, partial_slides)
+    return writer
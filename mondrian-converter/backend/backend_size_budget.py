@@ -0,0 +1,195 @@
+# Save this file as backend/backend_size_budget.py
+import random
+
+from backend_image_encoder import DEFAULT_JPEG_QUALITY
+from backend_memory_budget import MB
+
+# Pages converted to estimate the size of the whole deck
+SAMPLE_PAGES = 4
+# Pages whose text-free background is probed at a low resolution to see
+# how often backgrounds repeat; identical images are stored only once
+PROBE_PAGES = 48
+# Seeds the choice of probe pages, so a document always gets the same plan
+PROBE_SEED = 0
+# Resolutions tried, from best to smallest; the requested DPI comes first
+# and only the steps below it are tried after it
+BUDGET_DPIS = (300, 200, 150, 120, 96, 72)
+# Encodings tried at each resolution after the requested one, from best to
+# smallest. Resolution is given up last: the text sits on top as text boxes,
+# so a lossy background costs less than a blurry one.
+BUDGET_ENCODINGS = (('auto', DEFAULT_JPEG_QUALITY), ('jpeg', 75), ('jpeg', 60))
+# The estimate has to fit in this fraction of the budget, leaving room for
+# pages that are bigger than the samples
+SIZE_MARGIN = 0.9
+# What a deck costs besides its images, measured on python-pptx decks:
+# the template, each slide, each text span and each vector shape
+DECK_BASE_BYTES = 28 * 1024
+SLIDE_BYTES = 700
+TEXT_BYTES_PER_SPAN = 20
+DRAWING_BYTES = 50
+
+
+def _page_weight(page):
+    """A cheap stand-in for how big a page converts: the pixels of its images, then its content length."""
+    pixels = sum(image[2] * image[3] for image in page.get_images(full=True))
+    return pixels, len(page.read_contents())
+
+
+def pick_sample_pages(doc, page_nums, count=SAMPLE_PAGES):
+    """
+    Picks up to count pages of page_nums to stand for the whole selection:
+    the pages are ordered by _page_weight and taken at evenly spaced
+    quantiles, so plain, heavy and middling pages are all represented.
+    Returns page numbers in document order.
+    """
+    if len(page_nums) <= count:
+        return list(page_nums)
+    ordered = sorted(page_nums, key=lambda page_num: _page_weight(doc.load_page(page_num)))
+    picks = {ordered[int((index + 0.5) * len(ordered) / count)] for index in range(count)}
+    return sorted(picks)
+
+
+def pick_probe_pages(page_nums, count=PROBE_PAGES, seed=PROBE_SEED):
+    """
+    Up to count pages of page_nums: page_nums is cut into count equal runs
+    and a random page is taken from each. A fixed stride would fall into
+    step with decks whose backgrounds repeat every few pages and miss some
+    of them; the seed keeps the choice the same from one run to the next.
+    """
+    if len(page_nums) <= count:
+        return list(page_nums)
+    rng = random.Random(seed)
+    bounds = [int(index * len(page_nums) / count) for index in range(count + 1)]
+    return [page_nums[rng.randrange(start, end)] for start, end in zip(bounds, bounds[1:])]
+
+
+def distinct_pages(signatures, page_count):
+    """
+    Estimates how many of page_count pages have a background of their own
+    from the background signatures of some of them: the probed pages'
+    distinct signatures, plus the unprobed pages times the share of probed
+    pages whose background showed up only once (Good-Turing). A template
+    deck comes out close to one background; pages that all differ, close
+    to page_count.
+    """
+    if not signatures:
+        return page_count
+    seen = {}
+    for signature in signatures:
+        seen[signature] = seen.get(signature, 0) + 1
+    singletons = sum(1 for times in seen.values() if times == 1)
+    unprobed = max(page_count - len(signatures), 0)
+    return len(seen) + unprobed * singletons / len(signatures)
+
+
+def candidate_encodings(encoder, quality):
+    """The encodings tried at each resolution, best first: the requested one, then BUDGET_ENCODINGS."""
+    requested = (encoder, quality)
+    return [requested] + [encoding for encoding in BUDGET_ENCODINGS if encoding != requested]
+
+
+def candidate_dpis(dpi):
+    """The resolutions tried, best first: the requested one, then the BUDGET_DPIS below it."""
+    return [dpi] + [step for step in BUDGET_DPIS if step < dpi]
+
+
+def image_bytes(result, encoding_index):
+    """
+    Bytes of a sampled page's images with its background in the
+    encoding_index-th encoding it was sampled in: the background tiles and
+    passed-through pictures.
+    """
+    tiles = sum(tile['sample_bytes'][encoding_index] for tile in result['tiles'])
+    return tiles + sum(len(picture['image']) for picture in result['pictures'])
+
+
+def slide_bytes(result):
+    """Estimated bytes of a sampled page's slide besides its images: the slide, text spans and vector shapes."""
+    counts = result['counts']
+    return SLIDE_BYTES + TEXT_BYTES_PER_SPAN * counts.get('spans', 0) + DRAWING_BYTES * counts.get('drawings', 0)
+
+
+class OutputSizeBudget:
+    """
+    Fits a conversion's output under limit_bytes without converting the
+    whole document. plan() converts a few sample pages (see
+    pick_sample_pages) at each candidate resolution, encodes every
+    background tile with each candidate encoding, and picks the best
+    setting whose estimated deck size fits SIZE_MARGIN of the budget;
+    resolution is lowered only when no encoding fits at the current one.
+    The estimate scales the average sample page to the page count, and its
+    images to the pages with a background of their own (see
+    distinct_pages), so decks whose pages vary a lot can still end up
+    over; record() takes the size of the deck actually written.
+    """
+
+    def __init__(self, limit_bytes):
+        self.limit_bytes = limit_bytes
+        self.dpi = None
+        self.encoder = None
+        self.quality = None
+        self.estimated_bytes = None
+        self.actual_bytes = None
+        self.fits = False
+        self.sample_pages = 0
+        self.distinct_pages = None
+        self.tried = 0
+
+    def estimate(self, results, encoding_index, page_count, image_pages):
+        """
+        Estimated deck size for page_count pages like the sampled ones,
+        image_pages of which have images of their own.
+        """
+        samples = max(len(results), 1)
+        images = sum(image_bytes(result, encoding_index) for result in results) / samples
+        slides = sum(slide_bytes(result) for result in results) / samples
+        return int(DECK_BASE_BYTES + slides * page_count + images * image_pages)
+
+    def plan(self, measure, page_count, signatures, dpi, encoder, quality):
+        """
+        Returns the (dpi, encoder, quality) to convert with. measure(dpi,
+        encodings) converts the sample pages at dpi and returns their
+        results, with every tile's 'sample_bytes' in each of encodings.
+        signatures are the background signatures of the probed pages (see
+        distinct_pages). Falls back to the smallest setting tried if none
+        fits.
+        """
+        self.distinct_pages = distinct_pages(signatures, page_count)
+        encodings = candidate_encodings(encoder, quality)
+        chosen = None
+        for step in candidate_dpis(dpi):
+            results = measure(step, encodings)
+            self.sample_pages = len(results)
+            for index, (step_encoder, step_quality) in enumerate(encodings):
+                self.tried += 1
+                estimated = self.estimate(results, index, page_count, self.distinct_pages)
+                candidate = (estimated, step, step_encoder, step_quality)
+                if chosen is None or candidate[0] < chosen[0]:
+                    chosen = candidate
+                if candidate[0] <= SIZE_MARGIN * self.limit_bytes:
+                    self.fits = True
+                    chosen = candidate
+                    break
+            if self.fits:
+                break
+        self.estimated_bytes, self.dpi, self.encoder, self.quality = chosen
+        return self.dpi, self.encoder, self.quality
+
+    def record(self, actual_bytes):
+        """Records the size of the deck written; 'fits' then tells if it is within the budget."""
+        self.actual_bytes = actual_bytes
+        self.fits = actual_bytes <= self.limit_bytes
+
+    def summary(self):
+        return {
+            'limit_mb': round(self.limit_bytes / MB, 1),
+            'estimated_mb': round((self.estimated_bytes or 0) / MB, 1),
+            'actual_mb': round((self.actual_bytes or 0) / MB, 1),
+            'fits': self.fits,
+            'dpi': self.dpi,
+            'encoder': self.encoder,
+            'quality': self.quality,
+            'sample_pages': self.sample_pages,
+            'distinct_pages': round(self.distinct_pages or 0, 1),
+            'settings_tried': self.tried,
+        }
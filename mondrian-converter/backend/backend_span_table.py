@@ -0,0 +1,116 @@
+# Save this file as backend/backend_span_table.py
+import fitz
+import numpy as np
+
+from backend_geometry import clip_rects
+
+# get_text("dict") flags without TEXT_PRESERVE_IMAGES: image blocks are
+# left out instead of carrying a copy of every image's bytes.
+TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+
+class SpanTable:
+    """
+    The text spans of one page, stored column-wise: 'bboxes' (n, 4) and
+    'sizes' as float32 (MuPDF's own precision), 'bold' flags, the PyMuPDF
+    'blocks' and page-wide 'lines' numbers, and all the text in one string
+    that 'offsets' cuts into spans. Fonts, colours, origins and image
+    blocks of the get_text("dict") result are not kept.
+
+    It takes a few dozen bytes per span rather than a dict per span, and
+    pickles as a handful of buffers. Indexing or iterating yields span
+    dicts with 'bbox', 'text', 'size', 'bold', 'block' and 'line', built
+    on the fly.
+    """
+
+    def __init__(self, bboxes, sizes, bold, blocks, lines, text, offsets):
+        self.bboxes = bboxes
+        self.sizes = sizes
+        self.bold = bold
+        self.blocks = blocks
+        self.lines = lines
+        self.text = text
+        self.offsets = offsets
+
+    @classmethod
+    def from_text_dict(cls, text_dict):
+        """Builds the table from the text blocks of a get_text("dict") result."""
+        bboxes, sizes, bold, blocks, lines, texts = [], [], [], [], [], []
+        line_num = 0
+        for block_num, block in enumerate(text_dict.get('blocks', [])):
+            if block.get('type') != 0:  # Not a text block
+                continue
+            for line in block.get('lines', []):
+                for span in line.get('spans', []):
+                    if not all(key in span for key in ['bbox', 'text', 'size']):
+                        continue
+                    bboxes.append(span['bbox'])
+                    sizes.append(span['size'])
+                    bold.append('bold' in span.get('font', '').lower())
+                    blocks.append(block_num)
+                    lines.append(line_num)
+                    texts.append(span['text'])
+                line_num += 1
+        offsets = np.zeros(len(texts) + 1, dtype=np.int32)
+        np.cumsum([len(text) for text in texts], out=offsets[1:])
+        return cls(np.array(bboxes, dtype=np.float32).reshape(-1, 4),
+                   np.array(sizes, dtype=np.float32),
+                   np.array(bold, dtype=bool),
+                   np.array(blocks, dtype=np.int32),
+                   np.array(lines, dtype=np.int32),
+                   ''.join(texts), offsets)
+
+    @classmethod
+    def from_page(cls, page):
+        """Extracts the table from a PyMuPDF page, skipping image blocks."""
+        return cls.from_text_dict(page.get_text('dict', flags=TEXT_FLAGS))
+
+    @classmethod
+    def empty(cls):
+        return cls.from_text_dict({})
+
+    def clip(self, bounds):
+        """
+        Returns the table with every bbox clipped to bounds (usually the
+        page rect) and the spans that lie entirely outside dropped.
+        """
+        bboxes, visible = clip_rects(self.bboxes, bounds)
+        clipped = SpanTable(bboxes.astype(np.float32), self.sizes, self.bold, self.blocks, self.lines,
+                            self.text, self.offsets)
+        return clipped if visible.all() else clipped.select(visible)
+
+    def select(self, mask):
+        """Returns a new table with only the spans where mask is True."""
+        starts, ends = self.offsets[:-1][mask], self.offsets[1:][mask]
+        offsets = np.zeros(len(starts) + 1, dtype=np.int32)
+        np.cumsum(ends - starts, out=offsets[1:])
+        text = ''.join(self.text[start:end] for start, end in zip(starts.tolist(), ends.tolist()))
+        return SpanTable(self.bboxes[mask], self.sizes[mask], self.bold[mask],
+                         self.blocks[mask], self.lines[mask], text, offsets)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the table."""
+        arrays = (self.bboxes, self.sizes, self.bold, self.blocks, self.lines, self.offsets)
+        return sum(array.nbytes for array in arrays) + len(self.text.encode())
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def _span(self, bbox, size, bold, block, line, start, end):
+        return {'bbox': tuple(bbox), 'text': self.text[start:end], 'size': size,
+                'bold': bold, 'block': block, 'line': line}
+
+    def __getitem__(self, index):
+        index = range(len(self))[index]
+        return self._span(self.bboxes[index].tolist(), float(self.sizes[index]),
+                          bool(self.bold[index]), int(self.blocks[index]), int(self.lines[index]),
+                          int(self.offsets[index]), int(self.offsets[index + 1]))
+
+    def __iter__(self):
+        # One tolist() per column is much cheaper than indexing element by element
+        columns = zip(self.bboxes.tolist(), self.sizes.tolist(), self.bold.tolist(),
+                      self.blocks.tolist(), self.lines.tolist(),
+                      self.offsets[:-1].tolist(), self.offsets[1:].tolist())
+        for column in columns:
+            yield self._span(*column)
@@ -0,0 +1,188 @@
+# Save this file as backend/backend_tables.py
+import numpy as np
+from pptx.enum.text import MSO_ANCHOR, PP_ALIGN
+from pptx.oxml.ns import qn
+from pptx.util import Pt
+
+POINTS_TO_EMUS = 12700
+# Tables with fewer cells than this stay text boxes
+MIN_TABLE_CELLS = 4
+# Ruled areas with text in fewer than this fraction of their cells are
+# diagrams or forms rather than tables
+MIN_FILLED_CELLS = 0.6
+# Pages drawing fewer lines and rectangles than this have no ruled tables,
+# and the (slow) table finder is not run on them
+MIN_RULES = 3
+# Cell edges this close (in points) are the same grid line
+EDGE_TOLERANCE = 1.0
+# Text this close to both sides of its cell counts as centred
+ALIGN_TOLERANCE = 2.0
+# "No Style, No Grid": no fills and no borders, the background already
+# shows the PDF's own rules and shading
+NO_STYLE_TABLE = '{2D5ABB26-0587-4C30-8999-92F81FD0307C}'
+
+
+def _grid_lines(values):
+    """Sorted positions of values, with those within EDGE_TOLERANCE of the previous one merged."""
+    lines = []
+    for value in sorted(values):
+        if not lines or value - lines[-1] > EDGE_TOLERANCE:
+            lines.append(value)
+    return np.array(lines)
+
+
+def _line_index(lines, value):
+    return int(np.abs(lines - value).argmin())
+
+
+def _cell_text(spans, members):
+    """Joins the spans of one cell: a line of the PDF per paragraph."""
+    lines = {}
+    for index in members:
+        lines.setdefault(int(spans.lines[index]), []).append(index)
+    return '\n'.join(''.join(spans[index]['text'] for index in sorted(line, key=lambda i: spans.bboxes[i][0]))
+                     for _, line in sorted(lines.items()))
+
+
+def _alignment(cell_bbox, text_bbox):
+    """Returns how text sits in its cell: ('left' or 'right', gap to that side) or ('center', 0)."""
+    left = max(text_bbox[0] - cell_bbox[0], 0)
+    right = max(cell_bbox[2] - text_bbox[2], 0)
+    if abs(left - right) <= ALIGN_TOLERANCE:
+        return 'center', 0
+    return ('left', float(left)) if left < right else ('right', float(right))
+
+
+def _read_table(table, spans, centers):
+    """
+    Turns one PyMuPDF table into a table dict. Returns (table dict, mask of
+    the spans it holds), or (None, None) if it does not look like a table:
+    fewer than MIN_TABLE_CELLS cells, cells that overlap or leave holes in
+    the grid, fewer than MIN_FILLED_CELLS of them with text, or a cell
+    holding text of separate blocks (boxes and labels of a diagram, say).
+    """
+    cells = [cell for row in table.rows for cell in row.cells if cell is not None]
+    if len(cells) < MIN_TABLE_CELLS:
+        return None, None
+    cols = _grid_lines([cell[0] for cell in cells] + [cell[2] for cell in cells])
+    rows = _grid_lines([cell[1] for cell in cells] + [cell[3] for cell in cells])
+    if len(cols) < 2 or len(rows) < 2:
+        return None, None
+
+    x0, y0, x1, y1 = table.bbox
+    inside = ((centers[:, 0] >= x0) & (centers[:, 0] <= x1)
+              & (centers[:, 1] >= y0) & (centers[:, 1] <= y1))
+    # Grid position of each span, then the cell that covers it
+    span_col = np.clip(np.searchsorted(cols, centers[:, 0]) - 1, 0, len(cols) - 2)
+    span_row = np.clip(np.searchsorted(rows, centers[:, 1]) - 1, 0, len(rows) - 2)
+    owner = np.full((len(rows) - 1, len(cols) - 1), -1)
+    table_cells = []
+    for cell in cells:
+        c0, c1 = _line_index(cols, cell[0]), _line_index(cols, cell[2])
+        r0, r1 = _line_index(rows, cell[1]), _line_index(rows, cell[3])
+        if c1 <= c0 or r1 <= r0:
+            continue
+        if (owner[r0:r1, c0:c1] >= 0).any():
+            return None, None
+        owner[r0:r1, c0:c1] = len(table_cells)
+        table_cells.append({'row': r0, 'col': c0, 'row_span': r1 - r0, 'col_span': c1 - c0,
+                            'bbox': tuple(cell), 'text': '', 'size': None, 'bold': False,
+                            'align': 'left', 'inset': 0})
+    if (owner < 0).any():
+        return None, None
+    span_cell = np.where(inside, owner[span_row, span_col], -1)
+
+    members = {}
+    for index in np.flatnonzero(span_cell >= 0).tolist():
+        members.setdefault(int(span_cell[index]), []).append(index)
+    if len(members) < MIN_FILLED_CELLS * len(table_cells):
+        return None, None
+    if any(len(set(spans.blocks[indices].tolist())) > 1 for indices in members.values()):
+        return None, None
+    for cell_num, indices in members.items():
+        cell = table_cells[cell_num]
+        boxes = spans.bboxes[indices]
+        cell['text'] = _cell_text(spans, indices)
+        cell['size'] = float(spans.sizes[indices].max())
+        cell['bold'] = bool(spans.bold[indices].all())
+        text_bbox = (boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max())
+        cell['align'], cell['inset'] = _alignment(cell['bbox'], text_bbox)
+    table_dict = {'bbox': tuple(table.bbox), 'cols': cols.tolist(), 'rows': rows.tolist(),
+                  'cells': table_cells}
+    return table_dict, span_cell >= 0
+
+
+def find_tables(page, spans):
+    """
+    Finds the ruled tables on a page with PyMuPDF's page.find_tables().
+    Returns (tables, in_table): a list of table dicts with the grid line
+    positions 'cols' and 'rows' and the 'cells', each with its grid
+    position and spans, text, largest font 'size', 'bold', 'align'
+    ('left', 'center' or 'right') and 'inset', the text's distance in
+    points from the side it is aligned to; and a mask of the spans in
+    'spans' (a SpanTable) whose text now belongs to a table. A span
+    belongs to the cell that holds its centre.
+    """
+    in_table = np.zeros(len(spans), dtype=bool)
+    if not len(spans) or not hasattr(page, 'find_tables'):
+        return [], in_table
+    if sum(len(drawing['items']) for drawing in page.get_cdrawings()) < MIN_RULES:
+        return [], in_table
+    centers = (spans.bboxes[:, :2] + spans.bboxes[:, 2:]) / 2
+    tables = []
+    for table in page.find_tables().tables:
+        table_dict, members = _read_table(table, spans, centers)
+        if table_dict is None:
+            continue
+        tables.append(table_dict)
+        in_table |= members
+    return tables, in_table
+
+
+def add_table(slide, table):
+    """
+    Adds a table dict from find_tables() to the slide as a native table
+    with no style, so only its text shows over the rendered background.
+    """
+    cols, rows = table['cols'], table['rows']
+    x0, y0 = cols[0], rows[0]
+    shape = slide.shapes.add_table(
+        len(rows) - 1, len(cols) - 1, int(x0 * POINTS_TO_EMUS), int(y0 * POINTS_TO_EMUS),
+        int((cols[-1] - x0) * POINTS_TO_EMUS), int((rows[-1] - y0) * POINTS_TO_EMUS))
+    pptx_table = shape.table
+    pptx_table.first_row = False
+    pptx_table.horz_banding = False
+    style = pptx_table._tbl.tblPr.find(qn('a:tableStyleId'))
+    if style is not None:
+        style.text = NO_STYLE_TABLE
+    # Set on the XML: the row.height setter resizes the frame every time,
+    # which is quadratic in the number of rows
+    tbl = pptx_table._tbl
+    for index, grid_col in enumerate(tbl.tblGrid.gridCol_lst):
+        grid_col.w = int((cols[index + 1] - cols[index]) * POINTS_TO_EMUS)
+    for index, tr in enumerate(tbl.tr_lst):
+        tr.h = int((rows[index + 1] - rows[index]) * POINTS_TO_EMUS)
+    shape.width = sum(grid_col.w for grid_col in tbl.tblGrid.gridCol_lst)
+    shape.height = sum(tr.h for tr in tbl.tr_lst)
+
+    for cell in table['cells']:
+        pptx_cell = pptx_table.cell(cell['row'], cell['col'])
+        if cell['row_span'] > 1 or cell['col_span'] > 1:
+            pptx_cell.merge(pptx_table.cell(cell['row'] + cell['row_span'] - 1,
+                                            cell['col'] + cell['col_span'] - 1))
+        if not cell['text']:
+            continue
+        inset = int(cell['inset'] * POINTS_TO_EMUS)
+        pptx_cell.margin_left = inset if cell['align'] == 'left' else 0
+        pptx_cell.margin_right = inset if cell['align'] == 'right' else 0
+        pptx_cell.margin_top = pptx_cell.margin_bottom = 0
+        pptx_cell.vertical_anchor = MSO_ANCHOR.MIDDLE
+        pptx_cell.text = cell['text']
+        for paragraph in pptx_cell.text_frame.paragraphs:
+            paragraph.alignment = {'left': PP_ALIGN.LEFT, 'center': PP_ALIGN.CENTER,
+                                   'right': PP_ALIGN.RIGHT}[cell['align']]
+            for run in paragraph.runs:
+                run.font.size = Pt(int(cell['size']))
+                if cell['bold']:
+                    run.font.bold = True
+    return shape
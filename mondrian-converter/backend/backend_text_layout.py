@@ -0,0 +1,136 @@
+# Save this file as backend/backend_text_layout.py
+
+# 'span'  - one text box per PDF span (the original behaviour)
+# 'line'  - one text box per line, one run per span
+# 'block' - one text box per paragraph block, one paragraph per line
+TEXT_GROUPINGS = ('span', 'line', 'block')
+
+# Spans whose vertical centres differ by at most this fraction of the row
+# height sit on the same row.
+ROW_TOLERANCE = 0.3
+# Spans on a row join one line when the gap between them is at most this
+# many times the font size; wider gaps separate columns.
+LINE_GAP_FACTOR = 1.0
+# A gap wider than this fraction of the font size stands for a space.
+SPACE_GAP_FACTOR = 0.15
+# Lines stack into one block when they start within BLOCK_INDENT points of
+# each other and the gap between them is at most BLOCK_GAP_FACTOR line heights.
+BLOCK_INDENT = 2.0
+BLOCK_GAP_FACTOR = 0.6
+
+
+def _union_bbox(bboxes):
+    return (min(bbox[0] for bbox in bboxes), min(bbox[1] for bbox in bboxes),
+            max(bbox[2] for bbox in bboxes), max(bbox[3] for bbox in bboxes))
+
+
+def _iter_rows(spans):
+    """Yields the spans of each row of text, ordered top to bottom."""
+    order = sorted(spans, key=lambda span: (span['bbox'][1] + span['bbox'][3]) / 2)
+    row = []
+    for span in order:
+        x0, y0, x1, y1 = span['bbox']
+        if row:
+            rx0, ry0, rx1, ry1 = row[0]['bbox']
+            if abs((y0 + y1) / 2 - (ry0 + ry1) / 2) > ROW_TOLERANCE * max(y1 - y0, ry1 - ry0):
+                yield row
+                row = []
+        row.append(span)
+    if row:
+        yield row
+
+
+def _split_row(row):
+    """Splits one row into lines at column-sized gaps, adding spaces for word gaps."""
+    row = sorted(row, key=lambda span: span['bbox'][0])
+    lines = [[row[0]]]
+    for span in row[1:]:
+        previous = lines[-1][-1]
+        gap = span['bbox'][0] - previous['bbox'][2]
+        size = max(span['size'], previous['size'])
+        if gap > LINE_GAP_FACTOR * size:
+            lines.append([span])
+            continue
+        if (gap > SPACE_GAP_FACTOR * size and not previous['text'].endswith(' ')
+                and not span['text'].startswith(' ')):
+            span = dict(span, text=' ' + span['text'])
+        lines[-1].append(span)
+    return lines
+
+
+def group_lines(spans):
+    """
+    Merges spans that sit next to each other on the same row into lines.
+    Returns a list of dicts with the line 'bbox' and its 'spans' in reading
+    order. This is geometric, so it does not depend on how PyMuPDF split the
+    text into lines.
+    """
+    lines = []
+    for row in _iter_rows(spans):
+        for line_spans in _split_row(row):
+            lines.append({'bbox': _union_bbox([span['bbox'] for span in line_spans]),
+                          'spans': line_spans})
+    return lines
+
+
+def _stacks_under(line, previous):
+    px0, py0, px1, py1 = previous['bbox']
+    x0, y0, x1, y1 = line['bbox']
+    height = max(py1 - py0, y1 - y0)
+    return (abs(x0 - px0) <= BLOCK_INDENT
+            and y0 >= py1 - ROW_TOLERANCE * height
+            and y0 - py1 <= BLOCK_GAP_FACTOR * height)
+
+
+def group_blocks(lines):
+    """
+    Stacks lines of the same PyMuPDF block into paragraph blocks. Consecutive
+    lines join while they are left-aligned and closely spaced. Returns a list
+    of lists of lines.
+    """
+    by_block = {}
+    for line in lines:
+        by_block.setdefault(line['spans'][0]['block'], []).append(line)
+
+    blocks = []
+    for block_lines in by_block.values():
+        block_lines.sort(key=lambda line: (line['bbox'][1], line['bbox'][0]))
+        current = [block_lines[0]]
+        for line in block_lines[1:]:
+            if _stacks_under(line, current[-1]):
+                current.append(line)
+            else:
+                blocks.append(current)
+                current = [line]
+        blocks.append(current)
+    return blocks
+
+
+def group_spans(spans, grouping='line'):
+    """
+    Groups a page's spans into text boxes. Returns a list of dicts with the
+    box 'bbox', its 'lines' (each a list of spans that become the runs of
+    one paragraph) and, for multi-line boxes, the 'line_pitch' in points.
+    """
+    if grouping not in TEXT_GROUPINGS:
+        raise ValueError(f"Unknown text grouping: {grouping}")
+    if not spans:
+        return []
+    if grouping == 'span':
+        return [{'bbox': tuple(span['bbox']), 'lines': [[span]], 'line_pitch': None}
+                for span in spans]
+
+    lines = group_lines(spans)
+    if grouping == 'line':
+        return [{'bbox': line['bbox'], 'lines': [line['spans']], 'line_pitch': None}
+                for line in lines]
+
+    boxes = []
+    for block in group_blocks(lines):
+        line_pitch = None
+        if len(block) > 1:
+            line_pitch = (block[-1]['bbox'][1] - block[0]['bbox'][1]) / (len(block) - 1)
+        boxes.append({'bbox': _union_bbox([line['bbox'] for line in block]),
+                      'lines': [line['spans'] for line in block],
+                      'line_pitch': line_pitch})
+    return boxes
@@ -0,0 +1,200 @@
+# Save this file as backend/backend_vector_shapes.py
+from lxml import etree
+from pptx.dml.color import RGBColor
+from pptx.enum.dml import MSO_LINE_DASH_STYLE
+from pptx.enum.shapes import MSO_CONNECTOR, MSO_SHAPE
+from pptx.oxml.ns import qn
+from pptx.util import Emu
+
+from backend_content_stream import find_operators
+
+POINTS_TO_EMUS = 12700
+
+# Pages with more vector paths than this are rasterized instead; thousands
+# of shapes make slides slow to open and larger than a rendered image.
+MAX_VECTOR_DRAWINGS = 500
+
+# Content that get_drawings() does not report: shadings ('sh') and inline
+# images ('BI'). Pages using them keep the raster background.
+_RASTER_ONLY_OPERATORS = {b'sh', b'BI'}
+
+# PowerPoint draws zero-width (hairline) strokes as nothing at all.
+MIN_LINE_WIDTH_EMUS = 9525
+
+
+def _rgb(color):
+    """Converts a PyMuPDF gray/RGB/CMYK float colour to an (r, g, b) tuple."""
+    if color is None:
+        return None
+    if len(color) == 1:
+        color = color * 3
+    elif len(color) == 4:
+        c, m, y, k = color
+        color = ((1 - c) * (1 - k), (1 - m) * (1 - k), (1 - y) * (1 - k))
+    return tuple(int(round(min(max(value, 0), 1) * 255)) for value in color)
+
+
+def _path_commands(items, close_path):
+    """
+    Turns the items of one get_drawings() path into a flat list of plain
+    ('M', x, y), ('L', x, y), ('C', x1, y1, x2, y2, x, y) and ('Z',)
+    commands, starting a new subpath wherever an item does not continue
+    from the previous point.
+    """
+    commands = []
+    current = None
+
+    def move_to(point):
+        if current != point:
+            commands.append(('M',) + point)
+
+    for item in items:
+        kind = item[0]
+        if kind == 'l':
+            start, end = tuple(item[1]), tuple(item[2])
+            move_to(start)
+            commands.append(('L',) + end)
+            current = end
+        elif kind == 'c':
+            start, end = tuple(item[1]), tuple(item[4])
+            move_to(start)
+            commands.append(('C',) + tuple(item[2]) + tuple(item[3]) + end)
+            current = end
+        elif kind in ('re', 'qu'):
+            if kind == 're':
+                x0, y0, x1, y1 = tuple(item[1])
+                corners = [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+            else:
+                quad = item[1]
+                corners = [tuple(quad.ul), tuple(quad.ur), tuple(quad.lr), tuple(quad.ll)]
+            commands.append(('M',) + corners[0])
+            commands.extend(('L',) + corner for corner in corners[1:])
+            commands.append(('Z',))
+            current = None
+    if close_path and commands and commands[-1] != ('Z',):
+        commands.append(('Z',))
+    return commands
+
+
+def _plain_drawing(drawing):
+    """Converts one get_drawings() path into picklable data for add_drawing."""
+    items = drawing['items']
+    kind = None
+    if len(items) == 1 and items[0][0] == 're':
+        kind = 'rect'
+    elif len(items) == 1 and items[0][0] == 'l' and drawing.get('fill') is None:
+        kind = 'line'
+    dashes = drawing.get('dashes') or ''
+    return {
+        'kind': kind,
+        'rect': tuple(drawing['rect']),
+        'commands': _path_commands(items, drawing.get('closePath')),
+        'fill': _rgb(drawing.get('fill')),
+        'fill_opacity': drawing.get('fill_opacity'),
+        'stroke': _rgb(drawing.get('color')) if 's' in drawing.get('type', 's') else None,
+        'stroke_opacity': drawing.get('stroke_opacity'),
+        'width': drawing.get('width') or 0,
+        'dashed': bool(dashes) and not dashes.startswith('[]'),
+    }
+
+
+def extract_drawings(page, max_drawings=MAX_VECTOR_DRAWINGS):
+    """
+    Returns the page's vector paths as plain data, or None if the page has
+    to be rasterized: it has images or shadings, or more than max_drawings
+    paths.
+    """
+    if page.get_images() or find_operators(page, _RASTER_ONLY_OPERATORS):
+        return None
+    drawings = page.get_drawings()
+    if len(drawings) > max_drawings:
+        return None
+    return [_plain_drawing(drawing) for drawing in drawings
+            if drawing.get('fill') is not None or drawing.get('color') is not None]
+
+
+def _set_alpha(color_parent, opacity):
+    """Adds an <a:alpha> to the colour inside a solidFill element."""
+    if opacity is None or opacity >= 1 or color_parent is None:
+        return
+    alpha = etree.SubElement(color_parent[0], qn('a:alpha'))
+    alpha.set('val', str(int(opacity * 100000)))
+
+
+def _style_shape(shape, drawing):
+    """Applies the drawing's fill and stroke to a shape."""
+    spPr = shape._element.spPr
+    if drawing['kind'] == 'line':
+        pass  # Connectors have no fill
+    elif drawing['fill'] is None:
+        shape.fill.background()
+    else:
+        shape.fill.solid()
+        shape.fill.fore_color.rgb = RGBColor(*drawing['fill'])
+        _set_alpha(spPr.find(qn('a:solidFill')), drawing['fill_opacity'])
+
+    line = shape.line
+    if drawing['stroke'] is None:
+        line.fill.background()
+        return
+    line.color.rgb = RGBColor(*drawing['stroke'])
+    line.width = Emu(max(int(drawing['width'] * POINTS_TO_EMUS), MIN_LINE_WIDTH_EMUS))
+    if drawing['dashed']:
+        line.dash_style = MSO_LINE_DASH_STYLE.DASH
+    _set_alpha(spPr.find(qn('a:ln')).find(qn('a:solidFill')), drawing['stroke_opacity'])
+
+
+def _add_point(parent, x, y, x0, y0):
+    pt = etree.SubElement(parent, qn('a:pt'))
+    pt.set('x', str(int((x - x0) * POINTS_TO_EMUS)))
+    pt.set('y', str(int((y - y0) * POINTS_TO_EMUS)))
+
+
+def _add_freeform(slide, drawing):
+    """Adds a custom-geometry shape tracing the drawing's path commands."""
+    x0, y0, x1, y1 = drawing['rect']
+    width = max(int((x1 - x0) * POINTS_TO_EMUS), 1)
+    height = max(int((y1 - y0) * POINTS_TO_EMUS), 1)
+    sp = slide.shapes._spTree.add_freeform_sp(
+        int(x0 * POINTS_TO_EMUS), int(y0 * POINTS_TO_EMUS), width, height)
+
+    path = etree.SubElement(sp.spPr.find(qn('a:custGeom')).find(qn('a:pathLst')), qn('a:path'))
+    path.set('w', str(width))
+    path.set('h', str(height))
+    if drawing['fill'] is None:
+        path.set('fill', 'none')
+    for command in drawing['commands']:
+        if command[0] == 'Z':
+            etree.SubElement(path, qn('a:close'))
+            continue
+        segment = etree.SubElement(path, qn({'M': 'a:moveTo', 'L': 'a:lnTo', 'C': 'a:cubicBezTo'}[command[0]]))
+        coords = command[1:]
+        for i in range(0, len(coords), 2):
+            _add_point(segment, coords[i], coords[i + 1], x0, y0)
+    return slide.shapes._shape_factory(sp)
+
+
+def add_drawing(slide, drawing):
+    """
+    Adds one vector path to the slide: rectangles become rectangle
+    autoshapes, single lines become connectors and everything else a
+    freeform with the original line and Bezier segments.
+    """
+    x0, y0, x1, y1 = drawing['rect']
+    if drawing['kind'] == 'rect':
+        shape = slide.shapes.add_shape(
+            MSO_SHAPE.RECTANGLE, int(x0 * POINTS_TO_EMUS), int(y0 * POINTS_TO_EMUS),
+            int((x1 - x0) * POINTS_TO_EMUS), int((y1 - y0) * POINTS_TO_EMUS))
+    elif drawing['kind'] == 'line':
+        (_, bx, by), (_, ex, ey) = drawing['commands'][:2]
+        shape = slide.shapes.add_connector(
+            MSO_CONNECTOR.STRAIGHT, int(bx * POINTS_TO_EMUS), int(by * POINTS_TO_EMUS),
+            int(ex * POINTS_TO_EMUS), int(ey * POINTS_TO_EMUS))
+    else:
+        shape = _add_freeform(slide, drawing)
+    _style_shape(shape, drawing)
+    # Autoshapes and connectors come with a theme style (shadow, text colour);
+    # the explicit fill and line above are all the PDF specifies.
+    style = shape._element.find(qn('p:style'))
+    if style is not None:
+        shape._element.remove(style)
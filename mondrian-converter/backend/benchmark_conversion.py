@@ -0,0 +1,440 @@
+# Save this file as backend/benchmark_conversion.py
+"""
+Benchmarks every entry of CONVERSION_STRATEGIES on a synthetic PDF corpus.
+
+The corpus is generated with PyMuPDF from a fixed seed, so every run
+converts the same documents:
+
+    text_dense    two columns of small print in several fonts
+    image_heavy   six JPEG/PNG photos per page with captions
+    vector_heavy  charts and diagrams of a few hundred paths per page
+    mixed_sizes   pages from receipt to A0 poster in one document
+    long          1,200 pages of plain reports
+
+Each conversion runs in a fresh process, which reports pages/sec, peak
+RSS (its own and its worker processes'), the output size and the latency
+of every page, taken between successive progress callbacks. Results are
+written as JSON; pass an earlier result file with --compare to diff them.
+
+    python benchmark_conversion.py --output before.json
+    python benchmark_conversion.py --output after.json --compare before.json
+    python benchmark_conversion.py --scale 0.05 --documents text_dense long
+    python benchmark_conversion.py --text-removal redact --output redact.json
+    python benchmark_conversion.py --option encoder=jpeg --option quality=70
+
+Options a strategy does not take (text removal for the image-only one,
+say) are left out of its conversions.
+"""
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import fitz
+from PIL import Image, ImageDraw
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Bump when the generated documents change, so old corpora are not reused
+CORPUS_VERSION = 1
+CORPUS_SEED = 1234
+# Pages of each document at --scale 1
+CORPUS_PAGES = {
+    'text_dense': 200,
+    'image_heavy': 100,
+    'vector_heavy': 200,
+    'mixed_sizes': 120,
+    'long': 1200,
+}
+# (width, height) in points, cycled through by the mixed_sizes document
+MIXED_PAGE_SIZES = [
+    (612, 792),     # Letter
+    (595, 842),     # A4
+    (1191, 842),    # A3 landscape
+    (960, 540),     # 16:9 slide
+    (2384, 3370),   # A0 poster
+    (226, 600),     # Receipt
+]
+LATENCY_PERCENTILES = (50, 90, 99)
+
+_WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+          'incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud '
+          'exercitation ullamco laboris nisi aliquip ex ea commodo consequat').split()
+_FONTS = ('helv', 'hebo', 'tiro', 'tibo', 'cour')
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _photo(rng, width, height, image_format):
+    """Returns a photo-like image (gradients plus noise) encoded as JPEG or PNG."""
+    base = Image.linear_gradient('L').resize((width, height)).rotate(rng.randrange(360))
+    noise = Image.effect_noise((width, height), rng.randrange(20, 60))
+    red = Image.blend(base, noise, 0.3)
+    green = Image.radial_gradient('L').resize((width, height))
+    blue = Image.blend(noise, green, rng.random())
+    image = Image.merge('RGB', (red, green, blue))
+    ImageDraw.Draw(image).ellipse(
+        [rng.randrange(width // 2), rng.randrange(height // 2), width - 1, height - 1],
+        fill=tuple(rng.randrange(256) for _ in range(3)))
+    out = io.BytesIO()
+    image.save(out, format=image_format, **({'quality': 85} if image_format == 'JPEG' else {}))
+    return out.getvalue()
+
+
+def _text_dense_page(doc, rng, page_num):
+    page = doc.new_page()
+    page.insert_text((40, 36), f"Report section {page_num + 1}", fontsize=16, fontname='hebo')
+    for column in range(2):
+        x = 40 + column * 272
+        for row in range(90):
+            font = _FONTS[rng.randrange(len(_FONTS))] if row % 7 == 0 else 'helv'
+            page.insert_text((x, 60 + row * 8), _sentence(rng, 9), fontsize=6.5, fontname=font)
+
+
+def _image_heavy_page(doc, rng, page_num, photos):
+    page = doc.new_page()
+    for slot in range(6):
+        x, y = 40 + (slot % 2) * 272, 50 + (slot // 2) * 245
+        page.insert_image(fitz.Rect(x, y, x + 256, y + 200), stream=photos[rng.randrange(len(photos))])
+        page.insert_text((x, y + 215), f"Figure {page_num * 6 + slot + 1}. {_sentence(rng, 5)}", fontsize=8)
+
+
+def _vector_heavy_page(doc, rng, page_num):
+    page = doc.new_page()
+    shape = page.new_shape()
+    # Bar chart
+    for bar in range(40):
+        height = rng.uniform(20, 250)
+        shape.draw_rect(fitz.Rect(50 + bar * 12, 330 - height, 59 + bar * 12, 330))
+        shape.finish(fill=(rng.random(), 0.4, 0.7), color=None)
+    # Axes and grid
+    for tick in range(11):
+        shape.draw_line((45, 330 - tick * 25), (540, 330 - tick * 25))
+        shape.finish(color=(0.8, 0.8, 0.8), width=0.5, dashes='[2] 0' if tick else None)
+    # Line plot of Bezier segments
+    points = [fitz.Point(50 + step * 24, rng.uniform(380, 520)) for step in range(21)]
+    for start, end in zip(points, points[1:]):
+        shape.draw_bezier(start, start + (8, -15), end - (8, -15), end)
+    shape.finish(color=(0.8, 0.1, 0.1), width=1.5, closePath=False)
+    # Flow diagram
+    for node in range(60):
+        center = fitz.Point(rng.uniform(70, 540), rng.uniform(560, 760))
+        if node % 3 == 0:
+            shape.draw_circle(center, rng.uniform(6, 14))
+        else:
+            shape.draw_rect(fitz.Rect(center - (14, 8), center + (14, 8)))
+        shape.finish(color=(0, 0, 0.4), fill=(0.85, 0.9, 1), width=0.8)
+        if node:
+            shape.draw_line(center, fitz.Point(rng.uniform(70, 540), rng.uniform(560, 760)))
+            shape.finish(color=(0.3, 0.3, 0.3), width=0.6)
+    shape.commit()
+    page.insert_text((50, 40), f"Figure sheet {page_num + 1}", fontsize=14, fontname='hebo')
+
+
+def _mixed_sizes_page(doc, rng, page_num, photos):
+    width, height = MIXED_PAGE_SIZES[page_num % len(MIXED_PAGE_SIZES)]
+    page = doc.new_page(width=width, height=height)
+    unit = min(width, height) / 20
+    page.draw_rect(fitz.Rect(unit, unit, width - unit, 3 * unit), color=(0, 0, 0.5), fill=(0.9, 0.9, 1))
+    page.insert_text((1.5 * unit, 2.3 * unit), f"Page {page_num + 1} ({width:g} x {height:g} pt)",
+                     fontsize=unit * 0.8, fontname='hebo')
+    page.insert_image(fitz.Rect(unit, 4 * unit, width / 2, height / 2), stream=photos[page_num % len(photos)])
+    lines = int((height / 2 - 4 * unit) / (unit * 0.6))
+    for line in range(lines):
+        page.insert_text((width / 2 + unit / 2, 4.5 * unit + line * unit * 0.6), _sentence(rng, 4),
+                         fontsize=unit * 0.45)
+    for line in range(12):
+        page.draw_line((unit, height / 2 + unit * (line + 1)), (width - unit, height / 2 + unit * (line + 1) * 1.1),
+                       color=(rng.random(), 0.2, 0.2), width=unit / 20)
+
+
+def _long_page(doc, rng, page_num):
+    page = doc.new_page()
+    page.insert_text((40, 40), "Quarterly operations report", fontsize=10, fontname='hebo')
+    page.draw_line((40, 46), (572, 46), color=(0.5, 0.5, 0.5), width=0.5)
+    for row in range(35):
+        page.insert_text((40, 70 + row * 18), _sentence(rng, 12), fontsize=10)
+    page.insert_text((290, 770), str(page_num + 1), fontsize=9)
+
+
+def _save(doc, path):
+    doc.set_metadata({})
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    doc.save(temp_path, garbage=3, deflate=True, no_new_id=True)
+    os.replace(temp_path, path)
+
+
+def generate_document(name, path, pages):
+    """Writes one corpus document with 'pages' pages to path."""
+    rng = random.Random(f"{CORPUS_SEED}:{name}")
+    photos = []
+    if name in ('image_heavy', 'mixed_sizes'):
+        photos = [_photo(rng, 640, 480, 'JPEG' if index % 4 else 'PNG') for index in range(8)]
+    with fitz.open() as doc:
+        for page_num in range(pages):
+            if name == 'text_dense':
+                _text_dense_page(doc, rng, page_num)
+            elif name == 'image_heavy':
+                _image_heavy_page(doc, rng, page_num, photos)
+            elif name == 'vector_heavy':
+                _vector_heavy_page(doc, rng, page_num)
+            elif name == 'mixed_sizes':
+                _mixed_sizes_page(doc, rng, page_num, photos)
+            elif name == 'long':
+                _long_page(doc, rng, page_num)
+            else:
+                raise ValueError(f"Unknown corpus document: {name}")
+        _save(doc, path)
+
+
+def build_corpus(directory, scale=1.0, names=None):
+    """
+    Generates the corpus documents into directory, reusing ones generated
+    before with the same version and scale. Returns {name: path}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    corpus = {}
+    for name in names or CORPUS_PAGES:
+        pages = max(1, int(round(CORPUS_PAGES[name] * scale)))
+        path = os.path.join(directory, f"{name}_{pages}p_v{CORPUS_VERSION}.pdf")
+        if not os.path.exists(path):
+            print(f"Generating {os.path.basename(path)}...")
+            generate_document(name, path, pages)
+        corpus[name] = path
+    return corpus
+
+
+def _peak_rss_bytes(who):
+    """Peak resident set size of this process or (RUSAGE_CHILDREN) its largest child."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a list of numbers, or None if it is empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(int(math.ceil(percent / 100 * len(ordered))) - 1, 0)]
+
+
+def _run_conversion(strategy, input_path, output_path, options, verbose, connection):
+    """Runs one conversion; this is the body of a fresh benchmark process."""
+    from backend_conversion import CONVERSION_STRATEGIES
+
+    stamps = []
+    total = [0]
+
+    def progress_callback(current, count, *args):
+        stamps.append(time.perf_counter())
+        total[0] = count
+
+    log = sys.stdout if verbose else io.StringIO()
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            error = CONVERSION_STRATEGIES[strategy](input_path, output_path, progress_callback, **options)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - started
+    latencies = [later - earlier for earlier, later in zip([started] + stamps, stamps)]
+    connection.send({
+        'error': error,
+        'seconds': seconds,
+        'pages': total[0] or len(stamps),
+        'latencies': latencies,
+        'peak_rss_bytes': _peak_rss_bytes(resource.RUSAGE_SELF) if resource else None,
+        'peak_worker_rss_bytes': _peak_rss_bytes(resource.RUSAGE_CHILDREN) if resource else None,
+    })
+    connection.close()
+
+
+def run_one(strategy, document, input_path, output_path, options, verbose=False):
+    """Converts one document with one strategy in a fresh process. Returns a result dict."""
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_conversion,
+                              args=(strategy, input_path, output_path, options, verbose, sender))
+    process.start()
+    sender.close()
+    try:
+        run = receiver.recv()
+    except EOFError:
+        run = None
+    process.join()
+    if run is None:
+        run = {'error': f"Benchmark process died (exit code {process.exitcode})",
+               'seconds': None, 'pages': 0, 'latencies': [],
+               'peak_rss_bytes': None, 'peak_worker_rss_bytes': None}
+
+    latencies_ms = [latency * 1000 for latency in run['latencies']]
+    output_bytes = os.path.getsize(output_path) if not run['error'] and os.path.exists(output_path) else None
+    result = {
+        'strategy': strategy,
+        'document': document,
+        'options': options,
+        'error': run['error'],
+        'pages': run['pages'],
+        'seconds': round(run['seconds'], 3) if run['seconds'] is not None else None,
+        'pages_per_sec': (round(run['pages'] / run['seconds'], 3)
+                          if run['pages'] and run['seconds'] and not run['error'] else None),
+        'peak_rss_mb': round(run['peak_rss_bytes'] / 2 ** 20, 1) if run['peak_rss_bytes'] else None,
+        'peak_worker_rss_mb': (round(run['peak_worker_rss_bytes'] / 2 ** 20, 1)
+                               if run['peak_worker_rss_bytes'] else None),
+        'output_bytes': output_bytes,
+        'latency_ms': {f"p{percent}": round(percentile(latencies_ms, percent), 2) if latencies_ms else None
+                       for percent in LATENCY_PERCENTILES},
+    }
+    result['latency_ms']['max'] = round(max(latencies_ms), 2) if latencies_ms else None
+    return result
+
+
+def _accepted_options(strategy, options):
+    """The options the strategy's converter takes; all of them if it takes **options."""
+    from backend_conversion import CONVERSION_STRATEGIES
+
+    parameters = inspect.signature(CONVERSION_STRATEGIES[strategy]).parameters
+    if any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters.values()):
+        return dict(options)
+    return {key: value for key, value in options.items() if key in parameters}
+
+
+def _parse_option(text):
+    """Parses a --option 'key=value'; the value is read as JSON if it can be, else kept as a string."""
+    key, separator, value = text.partition('=')
+    if not separator or not key:
+        raise argparse.ArgumentTypeError(f"expected key=value, got {text!r}")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def run_benchmark(corpus, strategies, options, output_dir, verbose=False):
+    """
+    Runs every strategy on every corpus document. PDF strategies take the
+    PDFs; 'ppt_to_pdf' takes the decks pdf_to_ppt produced from them.
+    """
+    results = []
+    for document, pdf_path in corpus.items():
+        for strategy in strategies:
+            if strategy.startswith('pdf_'):
+                input_path, strategy_options, extension = pdf_path, _accepted_options(strategy, options), 'pptx'
+            else:
+                input_path = os.path.join(output_dir, f"{document}.pdf_to_ppt.pptx")
+                strategy_options, extension = {}, 'pdf'
+                if not os.path.exists(input_path):
+                    continue
+            output_path = os.path.join(output_dir, f"{document}.{strategy}.{extension}")
+            print(f"{strategy} on {document}...", flush=True)
+            result = run_one(strategy, document, input_path, output_path, strategy_options, verbose)
+            if result['error']:
+                print(f"  failed: {result['error']}", flush=True)
+            else:
+                print(f"  {result['pages']} pages, {result['seconds']}s, {result['pages_per_sec']} pages/s, "
+                      f"peak RSS {result['peak_rss_mb']} MB, p50 {result['latency_ms']['p50']} ms, "
+                      f"p99 {result['latency_ms']['p99']} ms", flush=True)
+            results.append(result)
+    return results
+
+
+_COMPARED = ('seconds', 'pages_per_sec', 'peak_rss_mb', 'output_bytes')
+
+
+def compare(baseline, current):
+    """Returns the changes from a baseline run to the current one, per strategy and document."""
+    before = {(result['strategy'], result['document']): result for result in baseline['results']}
+    changes = []
+    for result in current['results']:
+        old = before.get((result['strategy'], result['document']))
+        if old is None:
+            continue
+        change = {'strategy': result['strategy'], 'document': result['document']}
+        fields = [(key, old.get(key), result.get(key)) for key in _COMPARED]
+        fields += [(f"latency_{key}", old['latency_ms'].get(key), value)
+                   for key, value in result['latency_ms'].items()]
+        for key, old_value, new_value in fields:
+            if old_value and new_value is not None:
+                change[key] = {'before': old_value, 'after': new_value,
+                               'ratio': round(new_value / old_value, 3)}
+        changes.append(change)
+    return changes
+
+
+def main(argv=None):
+    from backend_conversion import CONVERSION_STRATEGIES
+    from backend_image_encoder import ENCODERS
+    from backend_text_layout import TEXT_GROUPINGS
+
+    parser = argparse.ArgumentParser(description="Benchmark the conversion strategies on a synthetic PDF corpus.")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON file to write the results to")
+    parser.add_argument('--compare', help="earlier results JSON to diff against")
+    parser.add_argument('--corpus', default=os.path.join(tempfile.gettempdir(), 'mondrian_benchmark_corpus'),
+                        help="directory for the generated PDFs (reused between runs)")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplies the page count of every document")
+    parser.add_argument('--documents', nargs='+', choices=list(CORPUS_PAGES), help="corpus documents to run")
+    parser.add_argument('--strategies', nargs='+', choices=list(CONVERSION_STRATEGIES),
+                        help="strategies to run (default: all)")
+    parser.add_argument('--workers', type=int, default=1, help="render processes for the PDF strategies")
+    parser.add_argument('--dpi', type=int, default=150)
+    parser.add_argument('--streaming', action='store_true', help="use the streaming .pptx writer")
+    parser.add_argument('--text-removal', choices=('filter', 'redact'), help="how text is taken out of the background")
+    parser.add_argument('--encoder', choices=ENCODERS, help="background image encoder")
+    parser.add_argument('--text-grouping', choices=TEXT_GROUPINGS, help="text box grouping")
+    parser.add_argument('--option', type=_parse_option, action='append', default=[], metavar='KEY=VALUE',
+                        help="any other converter option, e.g. quality=70 or image_passthrough=true (repeatable)")
+    parser.add_argument('--verbose', action='store_true', help="show the converters' own output")
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus(args.corpus, args.scale, args.documents)
+    strategies = args.strategies or list(CONVERSION_STRATEGIES)
+    options = {'dpi': args.dpi, 'workers': args.workers, 'streaming': args.streaming}
+    for key in ('text_removal', 'encoder', 'text_grouping'):
+        if getattr(args, key) is not None:
+            options[key] = getattr(args, key)
+    options.update(args.option)
+    started = datetime.now()
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = run_benchmark(corpus, strategies, options, output_dir, args.verbose)
+
+    report = {
+        'meta': {
+            'started': started.isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pymupdf': fitz.VersionBind,
+            'corpus_version': CORPUS_VERSION,
+            'scale': args.scale,
+            'options': options,
+        },
+        'results': results,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            report['comparison'] = compare(json.load(f), report)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
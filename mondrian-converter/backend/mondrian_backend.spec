@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('templates', 'templates'), ('C:\\Users\\minse\\Desktop\\Scripts\\conversion\\Lib\\site-packages\\dateparser\\data', 'dateparser/data')],
-    hiddenimports=[],
+    hiddenimports=['psutil'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,51 @@
+import pytest
+
+from backend_content_stream import COMPLEX_CLIP, hide_text_operators, iter_tokens, iter_xobject_draws
+
+
+def tokens(data):
+    return [(kind, data[start:end]) for kind, start, end in iter_tokens(data)]
+
+
+def test_nested_parens_stay_inside_the_string():
+    data = b'(a (nested (deep)) string) Tj'
+    assert tokens(data) == [('string', b'(a (nested (deep)) string)'), ('word', b'Tj')]
+
+
+def test_escaped_parens_do_not_open_or_close_the_string():
+    data = rb'(\(not nested\) \\) Tj'
+    assert tokens(data) == [('string', rb'(\(not nested\) \\)'), ('word', b'Tj')]
+
+
+def test_unterminated_string_runs_to_the_end():
+    assert tokens(b'(never closed Tj') == [('string', b'(never closed Tj')]
+
+
+def test_inline_image_data_is_skipped():
+    data = b'BI /W 2 /H 1 /CS /G /BPC 8 ID ( 0 Tr)EI\nEI Q 1 Tr'
+    assert [token for kind, token in tokens(data) if kind == 'word'] == [
+        b'BI', b'2', b'1', b'8', b'ID', b'EI', b'Q', b'1', b'Tr']
+
+
+def test_text_in_strings_and_images_is_not_rewritten():
+    data = b'BT (0 Tr) Tj ET BI /W 1 ID 1 Tr EI 2 Tr'
+    assert hide_text_operators(data) == b'BT (0 Tr) Tj ET BI /W 1 ID 1 Tr EI 3 Tr'
+
+
+@pytest.mark.parametrize('mode', range(8))
+def test_render_modes_become_invisible_and_keep_clipping(mode):
+    hidden = b'3' if mode < 4 else b'7'
+    assert hide_text_operators(b'BT %d Tr (x) Tj ET' % mode) == b'BT ' + hidden + b' Tr (x) Tj ET'
+
+
+def test_streams_without_render_modes_are_left_alone():
+    assert hide_text_operators(b'BT /F1 12 Tf (Transparent) Tj ET') is None
+
+
+def test_xobject_draws_follow_the_graphics_state():
+    streams = [b'q 0 0 200 100 re W n q 100 0 0 50 10 20 cm /Im1 Do Q Q',
+               b'q 10 10 m 20 20 l W n /Im2 Do Q /Im3 Do']
+    draws = [(index, data, ctm, clip) for index, _, _, data, ctm, clip in iter_xobject_draws(streams)]
+    assert draws == [(0, b'Im1', (100, 0, 0, 50, 10, 20), (0, 0, 200, 100)),
+                     (1, b'Im2', (1, 0, 0, 1, 0, 0), COMPLEX_CLIP),
+                     (1, b'Im3', (1, 0, 0, 1, 0, 0), None)]
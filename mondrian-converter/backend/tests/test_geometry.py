@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from backend_geometry import GridIndex
+
+
+def linear_query(rects, rect):
+    """What GridIndex.query() must return, by testing every rect."""
+    qx0, qy0, qx1, qy1 = rect
+    if not (qx1 > qx0 and qy1 > qy0):
+        return []
+    return [index for index, (x0, y0, x1, y1) in enumerate(rects)
+            if x1 > x0 and y1 > y0 and x0 < qx1 and qx0 < x1 and y0 < qy1 and qy0 < y1]
+
+
+def random_rects(rng, count):
+    """Mostly small rects on a page, with some page-sized, empty and off-page ones."""
+    x0 = rng.uniform(-50, 650, count)
+    y0 = rng.uniform(-50, 850, count)
+    size = rng.choice([0, 2, 10, 40, 500], count, p=[0.05, 0.4, 0.4, 0.1, 0.05])
+    width = size * rng.uniform(0.2, 2, count)
+    height = size * rng.uniform(0.2, 2, count)
+    return np.column_stack([x0, y0, x0 + width, y0 + height])
+
+
+@pytest.mark.parametrize('count', [0, 1, 5, 300, 3000])
+def test_query_matches_a_linear_scan(count):
+    rng = np.random.default_rng(count)
+    rects = random_rects(rng, count)
+    index = GridIndex(rects)
+    for query in random_rects(rng, 200):
+        assert index.query(tuple(query)).tolist() == linear_query(rects.tolist(), tuple(query))
+
+
+def test_touching_edges_do_not_overlap():
+    index = GridIndex([(0, 0, 10, 10), (10, 0, 20, 10)])
+    assert index.query((10, 0, 15, 5)).tolist() == [1]
+    assert index.query((5, 10, 15, 20)).tolist() == []
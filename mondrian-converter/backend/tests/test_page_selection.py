@@ -0,0 +1,33 @@
+import pytest
+
+from backend_page_selection import parse_page_ranges
+
+
+@pytest.mark.parametrize('spec, expected', [
+    (None, [0, 1, 2, 3, 4, 5, 6]),
+    ('', [0, 1, 2, 3, 4, 5, 6]),
+    ('   ', [0, 1, 2, 3, 4, 5, 6]),
+    ('1-3, 5-', [0, 1, 2, 4, 5, 6]),
+    ('-2', [0, 1]),
+    ('7', [6]),
+    ('2, 2, 1-2', [0, 1]),
+    ('3;1 ,, 2', [0, 1, 2]),
+    ('4 - 4', [3]),
+    ([3, 1], [0, 2]),
+    (('7',), [6]),
+])
+def test_selections(spec, expected):
+    assert parse_page_ranges(spec, 7) == expected
+
+
+@pytest.mark.parametrize('spec', ['0', '3-1', '0-2', 'a', '1-2-3', '2 3', '-', ' , ', '8', '5-9', [0]])
+def test_bad_selections(spec):
+    with pytest.raises(ValueError):
+        parse_page_ranges(spec, 7)
+
+
+def test_syntax_only_without_page_count():
+    assert parse_page_ranges('100-, 3', None) is None
+    assert parse_page_ranges(None) is None
+    with pytest.raises(ValueError):
+        parse_page_ranges('3-1')
@@ -10,7 +10,9 @@ from backend_conversion import CONVERSION_STRATEGIES
 class AppColors:
     SUCCESS, ERROR, INFO, SECONDARY = "#4CAF50", "#F44336", "#FFFFFF", "#B0BEC5"
 
-QUALITY_MAP = {"High (150 DPI)": 150, "Good (120 DPI)": 120, "Fast (96 DPI)": 96}
+# Quality -> (DPI on the slide, megapixel cap per page). The cap keeps posters
+# and engineering drawings from rendering into huge images.
+QUALITY_MAP = {"High (150 DPI)": (150, 24), "Good (120 DPI)": (120, 16), "Fast (96 DPI)": (96, 8)}
 
 class PdfConverterView(ctk.CTkFrame):
     def __init__(self, master, back_callback):
@@ -63,6 +65,9 @@ class PdfConverterView(ctk.CTkFrame):
         self.quality_selector = ctk.CTkSegmentedButton(options_frame, values=list(QUALITY_MAP.keys()))
         self.quality_selector.grid(row=4, column=0, sticky="ew")
         self.quality_selector.set("Good (120 DPI)")
+        ctk.CTkLabel(options_frame, text="Pages (blank for all):").grid(row=5, column=0, pady=(15,5), sticky="w")
+        self.pages_entry = ctk.CTkEntry(options_frame, placeholder_text="e.g. 1-20, 45, 100-110")
+        self.pages_entry.grid(row=6, column=0, sticky="ew")
 
         self.convert_button = ctk.CTkButton(self, text="Convert", font=ctk.CTkFont(size=24, weight="bold"), height=60, command=self._start_conversion_thread)
         self.convert_button.grid(row=4, column=0, padx=20, pady=20, sticky="ew")
@@ -104,14 +109,15 @@ class PdfConverterView(ctk.CTkFrame):
 
     def _run_conversion(self):
         from_format, to_format, mode, quality_text = self.from_menu.get(), self.to_menu.get(), self.mode_selector.get(), self.quality_selector.get()
-        dpi = QUALITY_MAP.get(quality_text, 120)
+        pages = self.pages_entry.get().strip() or None
+        dpi, max_megapixels = QUALITY_MAP.get(quality_text, QUALITY_MAP["Good (120 DPI)"])
         strategy_key = (from_format, to_format, mode)
         conversion_function = CONVERSION_STRATEGIES.get(strategy_key)
         base_name = os.path.splitext(os.path.basename(self.input_file_path))[0]
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         output_filename = f"{base_name}_{timestamp}.pptx"
         self.last_output_path = os.path.join(os.path.dirname(self.input_file_path), output_filename)
-        error_message = conversion_function(self.input_file_path, self.last_output_path, lambda c, t: self.after(0, self._update_progress, c, t), dpi=dpi) if conversion_function else f"Conversion not supported."
+        error_message = conversion_function(self.input_file_path, self.last_output_path, lambda c, t: self.after(0, self._update_progress, c, t), dpi=dpi, max_megapixels=max_megapixels, pages=pages) if conversion_function else f"Conversion not supported."
         self.after(0, self._finish_conversion, error_message, self.last_output_path)
 
     def _finish_conversion(self, error_message, output_path):
@@ -137,7 +143,7 @@ class PdfConverterView(ctk.CTkFrame):
     def _set_ui_state(self, is_converting):
         state = "disabled" if is_converting else "normal"
         button_text = "Converting..." if is_converting else "Convert"
-        for widget in [self.from_menu, self.to_menu, self.select_file_button, self.mode_selector, self.quality_selector]:
+        for widget in [self.from_menu, self.to_menu, self.select_file_button, self.mode_selector, self.quality_selector, self.pages_entry]:
             widget.configure(state=state)
         self.convert_button.configure(state=state, text=button_text)
         if not is_converting: self.progress_bar.set(0)
\ No newline at end of file
@@ -50,6 +50,9 @@ class FileConverterApp(ctk.CTk):
         self.select_file_button.grid(row=0, column=0, padx=10, pady=10)
         self.file_label = ctk.CTkLabel(file_frame, text="No file selected", text_color="gray", anchor="w")
         self.file_label.grid(row=0, column=1, padx=10, pady=10, sticky="ew")
+        ctk.CTkLabel(file_frame, text="Pages").grid(row=1, column=0, padx=10, pady=(0, 10))
+        self.pages_entry = ctk.CTkEntry(file_frame, placeholder_text="All pages (e.g. 1-20, 45, 100-110)")
+        self.pages_entry.grid(row=1, column=1, padx=10, pady=(0, 10), sticky="ew")
 
         # Mode Selection
         self.mode_label = ctk.CTkLabel(self, text="Conversion Mode:", font=ctk.CTkFont(size=12, weight="bold"))
@@ -115,7 +118,8 @@ class FileConverterApp(ctk.CTk):
         error_message = None
         if conversion_function:
             progress_callback = lambda current, total: self.after(0, self._update_progress, current, total)
-            error_message = conversion_function(self.input_file_path, output_path, progress_callback)
+            pages = self.pages_entry.get().strip() or None
+            error_message = conversion_function(self.input_file_path, output_path, progress_callback, pages=pages)
         else:
             error_message = f"Conversion from {from_format} to {to_format} ({mode}) is not supported."
         
@@ -133,7 +137,7 @@ class FileConverterApp(ctk.CTk):
     def _set_ui_state(self, is_converting):
         state = "disabled" if is_converting else "normal"
         button_text = "Converting..." if is_converting else "Convert"
-        for widget in [self.convert_button, self.from_menu, self.to_menu, self.select_file_button, self.mode_selector]:
+        for widget in [self.convert_button, self.from_menu, self.to_menu, self.select_file_button, self.mode_selector, self.pages_entry]:
             widget.configure(state=state)
         self.convert_button.configure(text=button_text)
         if not is_converting: self.progress_bar.set(0)